@@ -37,8 +37,23 @@ class CustomArgparseFormatter(HelpFormatter):
         return HelpFormatter._split_lines(self, text, width)
 
 
-def create_parser(formatter_class=None):
-    ''' Create lkadmin CLI argument parser '''
+# subcommands, each implemented by the lkadmin module of the same name
+_SUBCOMMAND_MODULES = ['core',
+                       'job',
+                       'synchrotron',
+                       'spears',
+                       'ariadne',
+                       'isotope',
+                       'planter',
+                       'flatpak']
+
+
+def create_parser(formatter_class=None, subcommand=None):
+    '''
+    Create lkadmin CLI argument parser.
+    If :subcommand is set, only the module implementing it is imported.
+    '''
+    import importlib
 
     if not formatter_class:
         formatter_class = CustomArgparseFormatter
@@ -52,29 +67,12 @@ def create_parser(formatter_class=None):
     parser.add_argument('--version', action='store_true', dest='show_version',
                         help='Display the version of Laniakea itself.')
 
-    import lkadmin.core as core
-    core.add_cli_parser(subparsers)
-
-    import lkadmin.job as job
-    job.add_cli_parser(subparsers)
-
-    import lkadmin.synchrotron as synchrotron
-    synchrotron.add_cli_parser(subparsers)
-
-    import lkadmin.spears as spears
-    spears.add_cli_parser(subparsers)
-
-    import lkadmin.ariadne as ariadne
-    ariadne.add_cli_parser(subparsers)
-
-    import lkadmin.isotope as isotope
-    isotope.add_cli_parser(subparsers)
-
-    import lkadmin.planter as planter
-    planter.add_cli_parser(subparsers)
-
-    import lkadmin.flatpak as flatpak
-    flatpak.add_cli_parser(subparsers)
+    mod_names = _SUBCOMMAND_MODULES
+    if subcommand in _SUBCOMMAND_MODULES:
+        mod_names = [subcommand]
+    for mod_name in mod_names:
+        mod = importlib.import_module('lkadmin.' + mod_name)
+        mod.add_cli_parser(subparsers)
 
     return parser
 
@@ -87,7 +85,10 @@ def run(mainfile, args):
     global __mainfile
     __mainfile = mainfile
 
-    parser = create_parser()
+    # the first positional argument selects the subcommand, so we only need to
+    # load the code of that one
+    subcommand = next((a for a in args if not a.startswith('-')), None)
+    parser = create_parser(subcommand=subcommand)
 
     args = parser.parse_args(args)
     check_print_version(args)
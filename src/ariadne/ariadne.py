@@ -82,7 +82,7 @@ def debcheck_has_issues_for_package(session, suite, spkg, arch):
         .filter(DebcheckIssue.suite_id == suite.id) \
         .filter(DebcheckIssue.package_name == spkg.name) \
         .filter(DebcheckIssue.package_version == spkg.version) \
-        .filter(DebcheckIssue.architectures.any(arch.name)).exists()
+        .filter(DebcheckIssue.architectures.contains([arch.name])).exists()
     return session.query(eq).scalar()
 
 
@@ -143,11 +143,11 @@ def schedule_build_for_arch(session, repo, spkg, arch, incoming_suite, *, enforc
     # let's go!
     if simulate:
         if has_dependency_issues:
-            log.info('New dependency-wait job for {} on {}'.format(str(spkg), arch.name))
+            log.info('New dependency-wait job for %s on %s', spkg, arch.name)
         else:
-            log.info('New actionable job for {} on {}'.format(str(spkg), arch.name))
+            log.info('New actionable job for %s on %s', spkg, arch.name)
     else:
-        log.debug('Creating new job for {} on {}'.format(str(spkg), arch.name))
+        log.debug('Creating new job for %s on %s', spkg, arch.name)
         job = Job()
         job.module = LkModule.ARIADNE
         job.kind = JobKind.PACKAGE_BUILD
@@ -190,9 +190,9 @@ def delete_orphaned_jobs(session, simulate=False):
         # This happens if a job is scheduled for a package, and then the package is removed entirely from
         # all archive suites while the job has not finished yet.
         if simulate:
-            log.info('Delete orphaned job: {}'.format(str(job.uuid)))
+            log.info('Delete orphaned job: %s', job.uuid)
         else:
-            log.debug('Deleting orphaned job: {}'.format(str(job.uuid)))
+            log.debug('Deleting orphaned job: %s', job.uuid)
             session.delete(job)
 
 
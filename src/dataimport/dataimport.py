@@ -41,16 +41,15 @@ from gi.repository import AppStream
 
 
 def _register_binary_packages(session, repo, suite, component, arch, existing_bpkgs, bpkgs, emitter=None):
-    import sqlalchemy as sa
-
+    new_bpkgs = []
+    new_suite_assocs = []
     for bpkg in bpkgs:
         e_suites = existing_bpkgs.pop(bpkg.uuid, None)
         if e_suites is not None:
             session.expunge(bpkg)
             if suite.id in e_suites:
                 continue  # the binary package is already registered with this suite
-            session.execute(sa.insert(binpkg_suite_assoc_table,
-                                      {'suite_id': suite.id, 'bin_package_uuid': bpkg.uuid}))
+            new_suite_assocs.append({'suite_id': suite.id, 'bin_package_uuid': bpkg.uuid})
             e_suites.append(suite.id)
 
             # NOTE: We do deliberately not emit messages for binary package suite changes, as they
@@ -58,7 +57,7 @@ def _register_binary_packages(session, repo, suite, component, arch, existing_bp
 
             continue
         else:
-            session.add(bpkg)
+            new_bpkgs.append(bpkg)
 
             _emit_package_event(emitter,
                                 'binary-package-published',
@@ -66,6 +65,12 @@ def _register_binary_packages(session, repo, suite, component, arch, existing_bp
                                 {'architecture': bpkg.architecture.name,
                                  'source_name': bpkg.source_name})
 
+    # register all new data in one go, so the database sees a single
+    # multi-row insert for the suite associations
+    if new_suite_assocs:
+        session.execute(binpkg_suite_assoc_table.insert(), new_suite_assocs)
+    session.add_all(new_bpkgs)
+
     return existing_bpkgs
 
 
@@ -106,13 +111,42 @@ def update_appstream_data(session, local_repo, repo, suite, component, arch):
     if len(cpts) == 0:
         return
 
-    log.debug('Found {} software components in {}/{}'.format(len(cpts), suite.name, component.name))
+    log.debug('Found %s software components in %s/%s', len(cpts), suite.name, component.name)
 
     # create context for direct serialization to collection XML chunk
     context = AppStream.Context()
     context.set_locale('ALL')
     context.set_style(AppStream.FormatStyle.COLLECTION)
 
+    # fetch the newest binary package for every package name referenced by the metadata
+    # as well as all possibly existing components in one go, instead of querying for each
+    # component individually
+    pkgnames = set()
+    cids = set()
+    for cpt in cpts:
+        pkgname = cpt.get_pkgname()
+        if pkgname:
+            pkgnames.add(pkgname)
+            cids.add(cpt.get_id())
+
+    bin_pkg_map = {}
+    if pkgnames:
+        for bpkg in session.query(BinaryPackage) \
+                .filter(BinaryPackage.name.in_(pkgnames)) \
+                .filter(BinaryPackage.repo_id == repo.id) \
+                .filter(BinaryPackage.architecture_id.in_((arch.id, arch_all.id))) \
+                .filter(BinaryPackage.component_id == component.id) \
+                .filter(BinaryPackage.suites.any(ArchiveSuite.id == suite.id)) \
+                .order_by(BinaryPackage.version.desc()):
+            # results are sorted by version, so the first package we see for a name is the newest one
+            bin_pkg_map.setdefault(bpkg.name, bpkg)
+
+    existing_dcpt_map = {}
+    if cids:
+        for e_dcpt in session.query(SoftwareComponent) \
+                .filter(SoftwareComponent.cid.in_(cids)):
+            existing_dcpt_map[e_dcpt.uuid] = e_dcpt
+
     for cpt in cpts:
         cpt.set_active_locale('C')
 
@@ -120,20 +154,14 @@ def update_appstream_data(session, local_repo, repo, suite, component, arch):
         if not pkgname:
             # we skip these for now, web-apps have no package assigned - we might need a better way to map
             # those to their packages, likely with an improved appstream-generator integration
-            log.debug('Found DEP-11 component without package name in {}/{}: {}'.format(suite.name, component.name, cpt.get_id()))
+            log.debug('Found DEP-11 component without package name in %s/%s: %s', suite.name, component.name, cpt.get_id())
             continue
 
         # fetch package this component belongs to
-        bin_pkg = session.query(BinaryPackage) \
-            .filter(BinaryPackage.name == pkgname) \
-            .filter(BinaryPackage.repo_id == repo.id) \
-            .filter(BinaryPackage.architecture_id.in_((arch.id, arch_all.id))) \
-            .filter(BinaryPackage.component_id == component.id) \
-            .filter(BinaryPackage.suites.any(ArchiveSuite.id == suite.id)) \
-            .order_by(BinaryPackage.version.desc()).first()
+        bin_pkg = bin_pkg_map.get(pkgname)
 
         if not bin_pkg:
-            log.info('Found orphaned DEP-11 component in {}/{}: {}'.format(suite.name, component.name, cpt.get_id()))
+            log.info('Found orphaned DEP-11 component in %s/%s: %s', suite.name, component.name, cpt.get_id())
             continue
 
         dcpt = SoftwareComponent()
@@ -144,13 +172,12 @@ def update_appstream_data(session, local_repo, repo, suite, component, arch):
 
         dcpt.gcid = cid_map.get(dcpt.cid)
         if not dcpt.gcid:
-            log.info('Found DEP-11 component without GCID in {}/{}: {}'.format(suite.name, component.name, cpt.get_id()))
+            log.info('Found DEP-11 component without GCID in %s/%s: %s', suite.name, component.name, cpt.get_id())
 
         # create UUID for this component (based on GCID or XML data)
         dcpt.update_uuid()
 
-        existing_dcpt = session.query(SoftwareComponent) \
-            .filter(SoftwareComponent.uuid == dcpt.uuid).one_or_none()
+        existing_dcpt = existing_dcpt_map.get(dcpt.uuid)
         if existing_dcpt:
             if bin_pkg in existing_dcpt.bin_packages:
                 continue  # the binary package is already registered with this component
@@ -189,7 +216,8 @@ def update_appstream_data(session, local_repo, repo, suite, component, arch):
         dcpt.bin_packages = [bin_pkg]
 
         session.add(dcpt)
-        log.debug('Added new software component \'{}\' to database'.format(dcpt.cid))
+        existing_dcpt_map[dcpt.uuid] = dcpt
+        log.debug('Added new software component \'%s\' to database', dcpt.cid)
     session.commit()
 
 
@@ -256,13 +284,21 @@ def import_suite_packages(suite_name):
             session.add(spkg)
             _emit_package_event(emitter, 'source-package-published', spkg)
 
+        removed_spkgs = []
         for old_spkg in existing_spkgs.values():
             if suite in old_spkg.suites:
                 old_spkg.suites.remove(suite)
                 _emit_package_event(emitter, 'source-package-suite-removed', old_spkg, {'suite_old': suite.name})
             if len(old_spkg.suites) <= 0:
-                for f in old_spkg.files:
-                    session.delete(f)
+                removed_spkgs.append(old_spkg)
+
+        if removed_spkgs:
+            # drop the files of all removed packages with a single query, instead of
+            # having the ORM load and delete them one by one
+            session.query(ArchiveFile) \
+                .filter(ArchiveFile.srcpkg_id.in_([p.uuid for p in removed_spkgs])) \
+                .delete(synchronize_session=False)
+            for old_spkg in removed_spkgs:
                 session.delete(old_spkg)
                 _emit_package_event(emitter, 'removed-source-package', old_spkg)
 
@@ -309,27 +345,36 @@ def import_suite_packages(suite_name):
                                                                                      component,
                                                                                      arch),
                                                        emitter)
-            session.commit()
+            # write the new packages, but only commit once the stale ones are gone as well,
+            # so each architecture is updated in a single transaction
+            session.flush()
 
+            suite_removed_bpkg_uuids = []
+            removed_bpkg_uuids = []
             for old_bpkg_uuid, suites in existing_bpkgs.items():
                 suites_count = len(suites)
                 if suite.id in suites:
-                    rc = session.query(binpkg_suite_assoc_table) \
-                                .filter(binpkg_suite_assoc_table.c.suite_id == suite.id) \
-                                .filter(binpkg_suite_assoc_table.c.bin_package_uuid == old_bpkg_uuid) \
-                                .delete(synchronize_session=False)
-                    if rc > 0:
-                        suites_count -= 1
+                    # the suite list was read from the association table, so the entry exists
+                    suite_removed_bpkg_uuids.append(old_bpkg_uuid)
+                    suites_count -= 1
                 if suites_count <= 0:
                     # delete the old package, we don't need it anymore if it is in no suites
-                    session.query(ArchiveFile) \
-                        .filter(ArchiveFile.binpkg_id == old_bpkg_uuid).delete()
-                    session.query(BinaryPackage) \
-                        .filter(BinaryPackage.uuid == old_bpkg_uuid).delete()
-
-                    # NOTE: We do not emit messages for removed binary packages, as they are usually
-                    # deleted with their source package (unless we have an arch-specific removal) and we
-                    # don't want to spam messages which may be uninteresting to current Laniakea modules.
+                    removed_bpkg_uuids.append(old_bpkg_uuid)
+
+            if suite_removed_bpkg_uuids:
+                session.query(binpkg_suite_assoc_table) \
+                       .filter(binpkg_suite_assoc_table.c.suite_id == suite.id) \
+                       .filter(binpkg_suite_assoc_table.c.bin_package_uuid.in_(suite_removed_bpkg_uuids)) \
+                       .delete(synchronize_session=False)
+            if removed_bpkg_uuids:
+                session.query(ArchiveFile) \
+                    .filter(ArchiveFile.binpkg_id.in_(removed_bpkg_uuids)).delete(synchronize_session=False)
+                session.query(BinaryPackage) \
+                    .filter(BinaryPackage.uuid.in_(removed_bpkg_uuids)).delete(synchronize_session=False)
+
+                # NOTE: We do not emit messages for removed binary packages, as they are usually
+                # deleted with their source package (unless we have an arch-specific removal) and we
+                # don't want to spam messages which may be uninteresting to current Laniakea modules.
 
             session.commit()
 
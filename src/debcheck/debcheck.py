@@ -66,7 +66,7 @@ def _update_debcheck_issues(session, repo, suite, new_issues, package_type):
     # add new entries
     for issue in new_issues:
         issue.package_type = package_type
-        session.add(issue)
+    session.add_all(new_issues)
 
     # make the result persistent
     session.commit()
@@ -0,0 +1,26 @@
+"""Add GIN index on debcheck issue architectures
+
+Revision ID: 07221f3b29cd
+Revises: fac701a4ee95
+Create Date: 2026-10-15 10:12:41.518237
+
+"""
+# flake8: noqa
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '07221f3b29cd'
+down_revision = 'fac701a4ee95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_debcheck_issues_architectures', 'debcheck_issues', ['architectures'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('idx_debcheck_issues_architectures', table_name='debcheck_issues')
@@ -0,0 +1,26 @@
+"""Add index on synchrotron issue config and kind
+
+Revision ID: 5d1a4c5e2b77
+Revises: 07221f3b29cd
+Create Date: 2026-10-15 11:02:17.730112
+
+"""
+# flake8: noqa
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1a4c5e2b77'
+down_revision = '07221f3b29cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_synchrotron_issues_config_kind', 'synchrotron_issues', ['config_id', 'kind'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_synchrotron_issues_config_kind', table_name='synchrotron_issues')
@@ -0,0 +1,26 @@
+"""Add index on synchrotron blacklist package names
+
+Revision ID: e4b9f0c3a6d1
+Revises: 5d1a4c5e2b77
+Create Date: 2026-10-15 11:31:52.402871
+
+"""
+# flake8: noqa
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9f0c3a6d1'
+down_revision = '5d1a4c5e2b77'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_synchrotron_blacklist_pkgname', 'synchrotron_blacklist', ['pkgname'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_synchrotron_blacklist_pkgname', table_name='synchrotron_blacklist')
@@ -113,6 +113,10 @@ class ArchiveSuite(Base):
                                 secondary=binpkg_suite_assoc_table,
                                 back_populates='suites')
 
+    synchrotron_configs = relationship('SynchrotronConfig',
+                                       back_populates='destination_suite',
+                                       cascade='all, delete')
+
     _primary_arch = None
 
     def __init__(self, name):
@@ -271,12 +275,15 @@ class PackageInfo:
     Basic package information, used by
     :SourcePackage to refer to binary packages.
     '''
-    deb_type = DebType.DEB
-    name = None
-    version = None
-    section = None
-    priority = PackagePriority.UNKNOWN
-    architectures = None
+    __slots__ = ('deb_type', 'name', 'version', 'section', 'priority', 'architectures')
+
+    def __init__(self):
+        self.deb_type = DebType.DEB
+        self.name = None
+        self.version = None
+        self.section = None
+        self.priority = PackagePriority.UNKNOWN
+        self.architectures = None
 
 
 class ArchiveFile(Base):
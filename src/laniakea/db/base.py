@@ -23,6 +23,7 @@ from sqlalchemy.types import UserDefinedType
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from contextlib import contextmanager
+from functools import lru_cache
 from ..localconfig import LocalConfig
 from ..utils import cd
 
@@ -56,58 +57,79 @@ from sqlalchemy.databases import postgres
 postgres.ischema_names['debversion'] = DebVersion
 
 
+@lru_cache(maxsize=None)
+def _get_engine(database_url, pool_size):
+    ''' Get the (shared) database engine for the given database. '''
+
+    # keep a pool of connections around, and check them before use so we
+    # don't stall on connections which were closed by the server
+    return create_engine(database_url,
+                         client_encoding='utf8',
+                         pool_size=pool_size,
+                         max_overflow=16,
+                         pool_pre_ping=True,
+                         pool_recycle=1800)
+
+
+@lru_cache(maxsize=None)
+def _get_session_maker(database_url, pool_size):
+    ''' Get the (shared) session factory for the given database. '''
+    return sessionmaker(bind=_get_engine(database_url, pool_size))
+
+
+@lru_cache(maxsize=None)
+def _default_session_maker():
+    ''' Get the session factory for the database of the local configuration. '''
+    lconf = LocalConfig()
+    return _get_session_maker(lconf.database_url, lconf.database_pool_size)
+
+
 class Database:
-    instance = None
-
-    class __Database:
-        def __init__(self, lconf=None):
-            if not lconf:
-                lconf = LocalConfig()
-            self._lconf = lconf
-
-            self._engine = create_engine(self._lconf.database_url, client_encoding='utf8')
-            self._SessionFactory = sessionmaker(bind=self._engine)
-
-        def create_tables(self):
-            ''' Initialize the database and create all tables '''
-            self.upgrade()
-            Base.metadata.create_all(self._engine)
-
-        def upgrade(self):
-            ''' Upgrade database schema to the newest revision '''
-            import alembic.config
-            from .. import lk_py_directory
-
-            with cd(lk_py_directory):
-                alembicArgs = [
-                    '--raiseerr',
-                    'upgrade', 'head',
-                ]
-                alembic.config.main(argv=alembicArgs)
-
-        def downgrade(self, revision):
-            ''' Upgrade database schema to the newest revision '''
-            import alembic.config
-            from .. import lk_py_directory
-
-            with cd(lk_py_directory):
-                alembicArgs = [
-                    '--raiseerr',
-                    'downgrade', revision,
-                ]
-                alembic.config.main(argv=alembicArgs)
+    '''
+    Access to the Laniakea database and its schema.
+    All instances for the same database share one engine and connection pool.
+    '''
 
     def __init__(self, lconf=None):
-        if not Database.instance:
-            Database.instance = Database.__Database(lconf)
-
-    def __getattr__(self, name):
-        return getattr(self.instance, name)
+        if not lconf:
+            lconf = LocalConfig()
+        self._lconf = lconf
+
+        self._engine = _get_engine(self._lconf.database_url, self._lconf.database_pool_size)
+        self._SessionFactory = _get_session_maker(self._lconf.database_url, self._lconf.database_pool_size)
+
+    def create_tables(self):
+        ''' Initialize the database and create all tables '''
+        self.upgrade()
+        Base.metadata.create_all(self._engine)
+
+    def upgrade(self):
+        ''' Upgrade database schema to the newest revision '''
+        import alembic.config
+        from .. import lk_py_directory
+
+        with cd(lk_py_directory):
+            alembicArgs = [
+                '--raiseerr',
+                'upgrade', 'head',
+            ]
+            alembic.config.main(argv=alembicArgs)
+
+    def downgrade(self, revision):
+        ''' Upgrade database schema to the newest revision '''
+        import alembic.config
+        from .. import lk_py_directory
+
+        with cd(lk_py_directory):
+            alembicArgs = [
+                '--raiseerr',
+                'downgrade', revision,
+            ]
+            alembic.config.main(argv=alembicArgs)
 
 
 def session_factory():
-    db = Database()
-    return db._SessionFactory()
+    return _default_session_maker()()
 
 
 @contextmanager
@@ -16,7 +16,7 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 from sqlalchemy import Column, String
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.dialects.postgresql import JSON, insert as pg_insert
 from .base import Base
 
 
@@ -79,16 +79,14 @@ def config_set_value(mod, key, value):
     '''
     Set a value in the configuration store
     '''
-    from laniakea.db import session_factory
+    from laniakea.db import session_scope
 
-    session = session_factory()
-    entry = session.query(ConfigEntry).filter_by(id='{}.{}'.format(mod, key)).one_or_none()
-    if entry:
-        entry.value = value
-    else:
-        entry = ConfigEntry(mod, key, value)
-        session.add(entry)
-    session.commit()
+    # insert or update the entry with a single statement
+    stmt = pg_insert(ConfigEntry.__table__).values(id='{}.{}'.format(mod, key), value=value)
+    stmt = stmt.on_conflict_do_update(index_elements=[ConfigEntry.id],
+                                      set_=dict(value=stmt.excluded.value))
+    with session_scope() as session:
+        session.execute(stmt)
 
 
 def config_get_distro_tag():
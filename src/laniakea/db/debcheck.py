@@ -16,7 +16,7 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import json
-from sqlalchemy import Column, Text, String, Integer, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Text, String, Integer, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.dialects.postgresql import JSON, ARRAY
 from marshmallow import Schema, fields, EXCLUDE
@@ -88,6 +88,15 @@ class DebcheckIssue(Base):
     _missing = None
     _conflicts = None
 
+    __table_args__ = (
+        # architectures are filtered with the array containment operator, which can use a GIN index
+        Index(
+            'idx_debcheck_issues_architectures',
+            architectures,
+            postgresql_using='gin'
+        ),
+    )
+
     @property
     def missing(self):
         if self._missing is not None:
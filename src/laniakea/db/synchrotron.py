@@ -18,8 +18,8 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import enum
-from sqlalchemy import Column, Text, String, DateTime, Enum, Integer, ForeignKey, Boolean
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, Text, String, DateTime, Enum, Integer, ForeignKey, Boolean, Index
+from sqlalchemy.orm import relationship, backref, deferred
 from sqlalchemy.dialects.postgresql import ARRAY
 from uuid import uuid4
 from datetime import datetime
@@ -50,10 +50,10 @@ class SynchrotronConfig(Base):
     id = Column(Integer, primary_key=True)
 
     source_id = Column(Integer, ForeignKey('synchrotron_sources.id'))
-    source = relationship('SynchrotronSource')
+    source = relationship('SynchrotronSource', lazy='selectin')  # there are only few sources, so load them all in one go
 
     destination_suite_id = Column(Integer, ForeignKey('archive_suites.id'))
-    destination_suite = relationship('ArchiveSuite', backref=backref('synchrotron_configs', cascade='all, delete'))
+    destination_suite = relationship('ArchiveSuite', back_populates='synchrotron_configs')
 
     sync_enabled = Column(Boolean(), default=True)  # true if syncs should happen
     sync_auto_enabled = Column(Boolean(), default=False)  # true if syncs should happen automatically
@@ -78,6 +78,11 @@ class SyncBlacklistEntry(Base):
 
     user = Column(String(256))  # Person who marked this to be ignored
 
+    __table_args__ = (
+        # packages are checked against the blacklist by name
+        Index('idx_synchrotron_blacklist_pkgname', pkgname),
+    )
+
 
 class SynchrotronIssueKind(enum.IntEnum):
     '''
@@ -91,17 +96,19 @@ class SynchrotronIssueKind(enum.IntEnum):
     REMOVAL_FAILED = 5
 
     def __str__(self):
-        if self.value == self.NONE:
-            return 'none'
-        if self.value == self.MERGE_REQUIRED:
-            return 'merge-required'
-        if self.value == self.MAYBE_CRUFT:
-            return 'maybe-cruft'
-        if self.value == self.SYNC_FAILED:
-            return 'sync-failed'
-        if self.value == self.REMOVAL_FAILED:
-            return 'removal-failed'
-        return 'SynchrotronIssueKind.' + str(self.name)
+        s = _SYNCHROTRON_ISSUE_KIND_STR.get(self)
+        if s is None:
+            return 'SynchrotronIssueKind.' + str(self.name)
+        return s
+
+
+_SYNCHROTRON_ISSUE_KIND_STR = {
+    SynchrotronIssueKind.NONE: 'none',
+    SynchrotronIssueKind.MERGE_REQUIRED: 'merge-required',
+    SynchrotronIssueKind.MAYBE_CRUFT: 'maybe-cruft',
+    SynchrotronIssueKind.SYNC_FAILED: 'sync-failed',
+    SynchrotronIssueKind.REMOVAL_FAILED: 'removal-failed',
+}
 
 
 class SynchrotronIssue(Base):
@@ -128,4 +135,11 @@ class SynchrotronIssue(Base):
     source_version = Column(DebVersion())  # package version to be synced
     target_version = Column(DebVersion())  # version of the package in the target suite and repo, to be overriden
 
-    details = Column(Text())  # additional information text about the issue (usually a log excerpt)
+    details = deferred(Column(Text()))  # additional information text about the issue (usually a log excerpt), only loaded on access
+
+    __table_args__ = (
+        # issues are always looked up per sync configuration
+        Index('idx_synchrotron_issues_config_kind',
+              config_id,
+              kind),
+    )
@@ -18,14 +18,156 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import json
+import glob
+import mmap
+import hashlib
+import tempfile
 import subprocess
 import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from laniakea.localconfig import LocalConfig
 from laniakea.repository import Repository
 from laniakea.db import DebcheckIssue, PackageType, PackageIssue, PackageConflict
 from laniakea.logging import log
 
+try:
+    import ryml
+except ImportError:
+    ryml = None
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+    if not ryml:
+        log.warning('PyYAML was built without libyaml support, parsing Dose reports will be slow. Install libyaml to speed this up.')
+
+
+_YAML_NULL_SCALARS = ('', '~', 'null', 'Null', 'NULL')
+
+
+def _ryml_node_to_py(tree, node):
+    '''
+    Convert a rapidyaml tree node into native Python types.
+    All scalars are returned as strings, except for unquoted null values.
+    '''
+
+    if tree.is_map(node):
+        res = {}
+        child = tree.first_child(node)
+        while child != ryml.NONE:
+            res[str(tree.key(child), 'utf-8')] = _ryml_node_to_py(tree, child)
+            child = tree.next_sibling(child)
+        return res
+    if tree.is_seq(node):
+        res = []
+        child = tree.first_child(node)
+        while child != ryml.NONE:
+            res.append(_ryml_node_to_py(tree, child))
+            child = tree.next_sibling(child)
+        return res
+
+    if not tree.has_val(node):
+        return None
+    value = str(tree.val(node), 'utf-8')
+    if value in _YAML_NULL_SCALARS and not tree.is_val_quoted(node):
+        return None
+    return value
+
+
+def _parse_dose_yaml(data):
+    '''
+    Parse a Dose YAML report (string, bytes or mmap) into native
+    Python dicts and lists.
+    Uses rapidyaml if it is available and falls back to PyYAML otherwise.
+    '''
+
+    if not ryml:
+        return yaml.load(data, Loader=_YamlLoader)
+
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    tree = ryml.parse_in_arena(data)
+    return _ryml_node_to_py(tree, tree.root_id())
+
+
+def _execute_dose(dose_exe, args, files=[], cache_fname=None):
+    '''
+    Run a Dose command and parse its YAML report.
+    If a cache filename is given, a successfully parsed report is stored there.
+
+    This is a module-level function, so it can be run in a worker process.
+    '''
+
+    cmd = [dose_exe]
+    cmd.extend(args)
+    cmd.extend(files)
+
+    # let Dose write its report to a temporary file (in memory, if possible) which
+    # we then map for parsing, instead of copying it through a pipe
+    tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryFile(dir=tmp_dir) as tf:
+        proc = subprocess.run(cmd,
+                              stdout=tf,
+                              stderr=subprocess.PIPE,
+                              check=False)
+        if os.fstat(tf.fileno()).st_size == 0:
+            return False, str(proc.stderr, 'utf-8', 'replace')
+
+        with mmap.mmap(tf.fileno(), 0, prot=mmap.PROT_READ) as mm:
+            if mm[:len(b'output-version')] != b'output-version':
+                # the output is weird, assume an error
+                return False, str(mm[:], 'utf-8', 'replace') + '\n' + str(proc.stderr, 'utf-8', 'replace')
+
+            dose_report = _parse_dose_yaml(mm)
+
+    if cache_fname:
+        _write_dose_report_cache(cache_fname, dose_report)
+
+    return True, dose_report
+
+
+def _write_dose_report_cache(cache_fname, dose_report):
+    '''
+    Atomically store a parsed Dose report in the cache, replacing
+    any older cached reports for the same check.
+    '''
+
+    cache_dir = os.path.dirname(cache_fname)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_fname = cache_fname + '.new'
+    with open(tmp_fname, 'w') as f:
+        json.dump(dose_report, f)
+    os.replace(tmp_fname, cache_fname)
+
+    # the fingerprint is the last part of the name, everything before it identifies the check
+    cache_prefix = cache_fname[:cache_fname.rindex('_') + 1]
+    for old_fname in glob.glob(glob.escape(cache_prefix) + '*.json'):
+        if old_fname != cache_fname:
+            os.remove(old_fname)
+
+
+def _extract_basic_package_info(entry):
+    '''
+    Read the basic package information from a Dose report entry.
+    Returns a (package_type, package_name, package_version, architectures) tuple.
+    '''
+
+    package_type = PackageType.SOURCE if entry.get('type') == 'src' else PackageType.BINARY
+    return (package_type,
+            str(entry['package']),
+            str(entry['version']),
+            str(entry['architecture']).split(','))
+
+
+def _apply_basic_package_info(target, pkg_info):
+    ''' Set the basic package information extracted from a Dose report entry on an object. '''
+
+    target.package_type, target.package_name, target.package_version, target.architectures = pkg_info
+
 
 class Debcheck:
     '''
@@ -37,30 +179,61 @@ class Debcheck:
         self._repo = Repository(lconf.archive_root_dir, 'master', entity=repo_entity)
         self._repo_entity = repo_entity
         self._repo.set_trusted(True)
+        self._index_info_cache = {}
+        self._dose_cache_dir = os.path.join(lconf.cache_dir, 'dose')
 
-    def _execute_dose(self, dose_exe, args, files=[]):
+    def _dose_cache_file(self, dose_exe, suite, arch_name, args, files, index_files):
+        '''
+        Get the cache filename for a Dose run. The name contains a fingerprint of
+        the complete command line and the state of all index files, so it changes
+        as soon as any of the inputs change.
+        '''
 
-        yaml_data = ''
-        cmd = [dose_exe]
-        cmd.extend(args)
-        cmd.extend(files)
+        fp = hashlib.blake2b(digest_size=20)
+        fp.update('\0'.join([dose_exe] + args + files).encode('utf-8'))
+        for fname in index_files:
+            st = os.stat(fname)
+            fp.update('\0{}\0{}\0{}'.format(fname, st.st_mtime_ns, st.st_size).encode('utf-8'))
 
-        pipe = subprocess.Popen(cmd,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                universal_newlines=True)
-        while True:
-            line = pipe.stdout.readline()
-            if line == '' and pipe.poll() is not None:
-                break
-            if line:
-                yaml_data += line
+        return os.path.join(self._dose_cache_dir,
+                            '{}-{}-{}-{}_{}.json'.format(self._repo_entity.name, suite.name, arch_name, dose_exe, fp.hexdigest()))
+
+    def _run_dose_jobs(self, dose_exe, suite, jobs):
+        '''
+        Run Dose for multiple architectures in parallel.
 
-        if not yaml_data.startswith('output-version'):
-            # the output is weird, assume an error
-            return False, yaml_data + '\n' + pipe.stderr.read()
+        Each job is a tuple of (arch_name, args, files, index_files). Yields (arch_name, success, data)
+        tuples as soon as the respective Dose run has finished, so the caller can
+        process a result while Dose is still running for the other architectures.
+        Dose is not run at all if none of the index files changed since the last successful run.
+        '''
 
-        return True, yaml_data
+        pending_jobs = []
+        for arch_name, args, files, index_files in jobs:
+            cache_fname = self._dose_cache_file(dose_exe, suite, arch_name, args, files, index_files)
+            if os.path.isfile(cache_fname):
+                log.debug('Using cached Dose report for %s/%s', suite.name, arch_name)
+                with open(cache_fname, 'r') as f:
+                    dose_report = json.load(f)
+                yield arch_name, True, dose_report
+                del dose_report
+            else:
+                pending_jobs.append((arch_name, args, files, cache_fname))
+
+        if not pending_jobs:
+            return
+
+        with ProcessPoolExecutor(max_workers=min(len(pending_jobs), os.cpu_count() or 1)) as executor:
+            futures = {executor.submit(_execute_dose, dose_exe, args, files, cache_fname): arch_name
+                       for arch_name, args, files, cache_fname in pending_jobs}
+            for future in as_completed(futures):
+                # drop our reference to the future, so each report can be freed
+                # as soon as the caller is done with it
+                arch_name = futures.pop(future)
+                success, data = future.result()
+                del future
+                yield arch_name, success, data
+                del data
 
     def _get_full_index_info(self, suite, arch, sources=False):
         '''
@@ -69,27 +242,40 @@ class Debcheck:
 
         The actual indices belonging to the suite are added as "foreground" (fg), the
         ones of the dependencies are added as "background" (bg).
+
+        Results are cached, so the returned lists must not be modified.
         '''
 
+        cache_key = (suite.id, arch.name, sources)
+        res = self._index_info_cache.get(cache_key)
+        if res is not None:
+            return res
+
         res = {'fg': [], 'bg': []}
-        bin_arch = suite.primary_architecture
+        arch_is_all = arch.name == 'all'
+
+        # the index paths relative to a component directory are the same for every component
+        sources_index = os.path.join('source', 'Sources.xz')
+        arch_packages_index = os.path.join('binary-{}'.format(arch.name), 'Packages.xz')
+        if arch_is_all:
+            primary_packages_index = os.path.join('binary-{}'.format(suite.primary_architecture.name), 'Packages.xz')
 
         for component in suite.components:
             if sources:
-                fname = self._repo.index_file(suite, os.path.join(component.name, 'source', 'Sources.xz'))
+                fname = self._repo.index_file(suite, os.path.join(component.name, sources_index))
                 if fname:
                     res['fg'].append(fname)
 
-                fname = self._repo.index_file(suite, os.path.join(component.name, 'binary-{}'.format(arch.name), 'Packages.xz'))
+                fname = self._repo.index_file(suite, os.path.join(component.name, arch_packages_index))
                 if fname:
                     res['bg'].append(fname)
             else:
-                fname = self._repo.index_file(suite, os.path.join(component.name, 'binary-{}'.format(arch.name), 'Packages.xz'))
+                fname = self._repo.index_file(suite, os.path.join(component.name, arch_packages_index))
                 if fname:
                     res['fg'].append(fname)
 
-            if arch.name == 'all':
-                fname = self._repo.index_file(suite, os.path.join(component.name, 'binary-{}'.format(bin_arch.name), 'Packages.xz'))
+            if arch_is_all:
+                fname = self._repo.index_file(suite, os.path.join(component.name, primary_packages_index))
                 if fname:
                     res['bg'].append(fname)
 
@@ -99,14 +285,16 @@ class Debcheck:
             res['bg'].extend(parent_indices['bg'])
             res['bg'].extend(parent_indices['fg'])
 
+        self._index_info_cache[cache_key] = res
         return res
 
     def _generate_build_depcheck_yaml(self, suite):
         '''
-        Get Dose YAML data for build dependency issues in the selected suite.
+        Get Dose reports for build dependency issues in the selected suite.
+        Yields (arch_name, report) tuples as the individual Dose runs complete.
         '''
 
-        arch_issue_map = {}
+        dose_jobs = []
         for arch in suite.architectures:
             # fetch source-package-centric index list
             indices = self._get_full_index_info(suite, arch, True)
@@ -123,20 +311,23 @@ class Debcheck:
                          '--deb-emulate-sbuild',
                          '--deb-native-arch={}'.format(suite.primary_architecture.name if arch.name == 'all' else arch.name)]
 
-            # run builddepcheck
-            success, data = self._execute_dose('dose-builddebcheck', dose_args, indices['bg'] + indices['fg'])
-            if not success:
-                raise Exception('Unable to run Dose for {}/{}: {}'.format(suite.name, arch.name, data))
-            arch_issue_map[arch.name] = data
+            index_files = indices['bg'] + indices['fg']
+            dose_jobs.append((arch.name, dose_args, index_files, index_files))
 
-        return arch_issue_map
+        # run builddepcheck
+        for arch_name, success, data in self._run_dose_jobs('dose-builddebcheck', suite, dose_jobs):
+            if not success:
+                raise Exception('Unable to run Dose for {}/{}: {}'.format(suite.name, arch_name, data))
+            yield arch_name, data
+            del data
 
     def _generate_depcheck_yaml(self, suite):
         '''
-        Get Dose YAML data for build installability issues in the selected suite.
+        Get Dose reports for installability issues in the selected suite.
+        Yields (arch_name, report) tuples as the individual Dose runs complete.
         '''
 
-        arch_issue_map = {}
+        dose_jobs = []
         for arch in suite.architectures:
             # fetch binary-package index list
             indices = self._get_full_index_info(suite, arch, False)
@@ -152,36 +343,48 @@ class Debcheck:
                          '--summary',
                          '--deb-native-arch={}'.format(suite.primary_architecture.name if arch.name == 'all' else arch.name)]
 
-            # run depcheck
             indices_args = []
             for f in indices['bg']:
                 indices_args.append('--bg={}'.format(f))
             for f in indices['fg']:
                 indices_args.append('--fg={}'.format(f))
-            success, data = self._execute_dose('dose-debcheck', dose_args, indices_args)
+            dose_jobs.append((arch.name, dose_args, indices_args, indices['bg'] + indices['fg']))
+
+        # run depcheck
+        for arch_name, success, data in self._run_dose_jobs('dose-debcheck', suite, dose_jobs):
             if not success:
+                _, dose_args, indices_args, _ = next(job for job in dose_jobs if job[0] == arch_name)
                 log.error('Dose debcheck command failed: ' + ' '.join(dose_args) + ' ' + ' '.join(indices_args) + '\n' + data)
-                raise Exception('Unable to run Dose for {}/{}: {}'.format(suite.name, arch.name, data))
+                raise Exception('Unable to run Dose for {}/{}: {}'.format(suite.name, arch_name, data))
 
-            arch_issue_map[arch.name] = data
+            yield arch_name, data
+            del data
 
-        return arch_issue_map
+    def _dose_yaml_to_issues(self, dose_report, suite, arch_name):
 
-    def _dose_yaml_to_issues(self, yaml_data, suite, arch_name):
+        # bind frequently used globals to local names for the hot loop below
+        extract_info = _extract_basic_package_info
+        apply_info = _apply_basic_package_info
 
         def set_basic_package_info(v, entry):
-            if 'type' in entry and entry['type'] == "src":
-                v.package_type = PackageType.SOURCE
-            else:
-                v.package_type = PackageType.BINARY
-
-            v.package_name = str(entry['package'])
-            v.package_version = str(entry['version'])
-            v.architectures = str(entry['architecture']).split(',')
+            apply_info(v, extract_info(entry))
+
+        def depchain_pkgissue(ypkg):
+            # depchain links are only ever serialized through the PackageIssue schema,
+            # which reads plain dicts just as well, so we avoid creating a schema per link
+            package_type, package_name, package_version, _ = extract_info(ypkg)
+            return {'package_type': package_type,
+                    'package_name': package_name,
+                    'package_version': package_version,
+                    'depends': ypkg.get('depends')}
+
+        def build_depchain(yconflict, key):
+            if key not in yconflict:
+                return []
+            return [depchain_pkgissue(ypkg) for ypkg in yconflict[key][0]['depchain']]
 
         res = []
-        yroot = yaml.safe_load(yaml_data)
-        report = yroot['report']
+        report = dose_report['report']
         arch_is_all = arch_name == 'all'
 
         # if the report is empty, we have no issues to generate and can quit
@@ -189,10 +392,11 @@ class Debcheck:
             return res
 
         for entry in report:
+            pkg_info = extract_info(entry)
             if not arch_is_all:
                 # we ignore entries from "all" unless we are explicitly reading information
                 # for that fake architecture.
-                if entry['architecture'] == 'all':
+                if pkg_info[3] == ['all']:
                     continue
 
             issue = DebcheckIssue()
@@ -202,7 +406,7 @@ class Debcheck:
             missing = []
             conflicts = []
 
-            set_basic_package_info(issue, entry)
+            apply_info(issue, pkg_info)
 
             reasons = entry['reasons']
             for reason in reasons:
@@ -220,8 +424,6 @@ class Debcheck:
                     conflict = PackageConflict()
                     conflict.pkg1 = PackageIssue()
                     conflict.pkg2 = PackageIssue()
-                    conflict.depchain1 = []
-                    conflict.depchain2 = []
 
                     set_basic_package_info(conflict.pkg1, yconflict['pkg1'])
                     if 'unsat-conflict' in yconflict['pkg1']:
@@ -231,27 +433,16 @@ class Debcheck:
                     if 'unsat-conflict' in yconflict['pkg2']:
                         conflict.pkg2.unsat_conflict = yconflict['pkg2']['unsat-conflict']
 
-                    # parse the depchain
-                    if 'depchain1' in yconflict:
-                        for ypkg in yconflict['depchain1'][0]['depchain']:
-                            pkgissue = PackageIssue()
-                            set_basic_package_info(pkgissue, ypkg)
-                            pkgissue.depends = ypkg.get('depends')
-                            conflict.depchain1.append(pkgissue)
-
-                    if 'depchain2' in yconflict:
-                        for ypkg in yconflict['depchain2'][0]['depchain']:
-                            pkgissue = PackageIssue()
-                            set_basic_package_info(pkgissue, ypkg)
-                            pkgissue.depends = ypkg.get('depends')
-                            conflict.depchain2.append(pkgissue)
+                    # parse the depchains
+                    conflict.depchain1 = build_depchain(yconflict, 'depchain1')
+                    conflict.depchain2 = build_depchain(yconflict, 'depchain2')
 
                     conflicts.append(conflict)
                 else:
                     raise Exception('Found unknown dependency issue: ' + str(reason))
 
-                issue.missing = missing
-                issue.conflicts = conflicts
+            issue.missing = missing
+            issue.conflicts = conflicts
 
             res.append(issue)
 
@@ -260,19 +451,21 @@ class Debcheck:
     def build_depcheck_issues(self, suite):
         ''' Get a list of build-dependency issues affecting the suite '''
 
+        self._index_info_cache.clear()
         issues = []
-        issues_yaml = self._generate_build_depcheck_yaml(suite)
-        for arch_name, yaml_data in issues_yaml.items():
-            issues.extend(self._dose_yaml_to_issues(yaml_data, suite, arch_name))
+        for arch_name, dose_report in self._generate_build_depcheck_yaml(suite):
+            issues.extend(self._dose_yaml_to_issues(dose_report, suite, arch_name))
+            del dose_report
 
         return issues
 
     def depcheck_issues(self, suite):
         ''' Get a list of dependency issues affecting the suite '''
 
+        self._index_info_cache.clear()
         issues = []
-        issues_yaml = self._generate_depcheck_yaml(suite)
-        for arch_name, yaml_data in issues_yaml.items():
-            issues.extend(self._dose_yaml_to_issues(yaml_data, suite, arch_name))
+        for arch_name, dose_report in self._generate_depcheck_yaml(suite):
+            issues.extend(self._dose_yaml_to_issues(dose_report, suite, arch_name))
+            del dose_report
 
         return issues
@@ -28,12 +28,33 @@ import os
 from laniakea.utils import run_command, deb822
 import firehose.model
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 
 class DudFileException(Exception):
     pass
 
 
+# checksum type -> (hashlib algorithm, DUD field, checksum entry key)
+_CHECKSUM_FIELDS = {
+    'sha1': ('sha1', 'Checksums-Sha1', 'sha1'),
+    'sha256': ('sha256', 'Checksums-Sha256', 'sha256'),
+    'md5': ('md5', 'Files', 'md5sum'),
+    'md5sum': ('md5', 'Files', 'md5sum'),
+}
+
+
+def _file_hexdigest(fname, algo):
+    '''
+    Calculate the hex digest of a file using hash algorithm :algo.
+    '''
+    m = hashlib.new(algo)
+    with open(fname, 'rb') as f:
+        for chunk in iter((lambda: f.read(1024 * 1024)), b''):
+            m.update(chunk)
+    return m.hexdigest()
+
+
 class Dud(object):
     def __init__(self, filename=None, string=None):
         if (filename and string) or (not filename and not string):
@@ -53,6 +74,10 @@ class Dud(object):
         if len(self._data) == 0:
             raise DudFileException('dud file could not be parsed.')
 
+        self._files = None
+        self._log_file = None
+        self._firehose_file = None
+
     def get_filename(self):
         '''
         Returns the filename from which the dud file was generated from.
@@ -74,20 +99,36 @@ class Dud(object):
             open(self.get_firehose_file(), 'r'))
 
     def get_firehose_file(self):
-        for item in self.get_files():
-            if item.endswith('.firehose.xml'):
-                return item
+        self._load_files()
+        return self._firehose_file
 
     def get_log_file(self):
-        for item in self.get_files():
-            if item.endswith('.log'):
-                return item
+        self._load_files()
+        return self._log_file
+
+    def _load_files(self):
+        '''
+        Build the list of files referenced by this dud and classify
+        the special files in a single pass.
+        '''
+        if self._files is not None:
+            return
+
+        self._files = []
+        for z in self._data['Files']:
+            item = os.path.join(self._directory, z['name'])
+            if self._firehose_file is None and item.endswith('.firehose.xml'):
+                self._firehose_file = item
+            elif self._log_file is None and item.endswith('.log'):
+                self._log_file = item
+            self._files.append(item)
 
     def get_files(self):
         '''
+        Returns the absolute paths of all files referenced by this dud.
         '''
-        return [os.path.join(self._directory, z['name'])
-                for z in self._data['Files']]
+        self._load_files()
+        return self._files
 
     def __getitem__(self, key):
         '''
@@ -175,38 +216,31 @@ class Dud(object):
             * md5
             * md5sum
         '''
-        for filename in self.get_files():
-            if check_hash == 'sha1':
-                hash_type = hashlib.sha1()
-                checksums = self.get('Checksums-Sha1')
-                field_name = 'sha1'
-            elif check_hash == 'sha256':
-                hash_type = hashlib.sha256()
-                checksums = self.get('Checksums-Sha256')
-                field_name = 'sha256'
-            elif check_hash == 'md5':
-                hash_type = hashlib.md5()
-                checksums = self.get('Files')
-                field_name = 'md5sum'
-
-            for changed_files in checksums:
-                if changed_files['name'] == os.path.basename(filename):
-                    break
-            else:
-                assert(
-                    'get_files() returns different files than Files: knows?!')
-
-            with open(filename, 'rb') as fc:
-                for chunk in iter(
-                    (lambda: fc.read(128 * hash_type.block_size)),
-                    b''
-                ):
-                    hash_type.update(chunk)
-
-            if not hash_type.hexdigest() == changed_files[field_name]:
+        try:
+            hash_algo, checksums_field, field_name = _CHECKSUM_FIELDS[check_hash]
+        except KeyError:
+            raise DudFileException('Unknown checksum type: {}'.format(check_hash))
+        checksums = self.get(checksums_field)
+
+        filenames = self.get_files()
+        if len(filenames) > 1:
+            # hashlib releases the GIL while hashing large buffers, so we can
+            # hash all files of the upload in parallel
+            with ThreadPoolExecutor(max_workers=min(len(filenames), os.cpu_count() or 1)) as executor:
+                digests = list(executor.map(lambda fname: _file_hexdigest(fname, hash_algo), filenames))
+        else:
+            digests = [_file_hexdigest(fname, hash_algo) for fname in filenames]
+
+        expected = {entry['name']: entry[field_name] for entry in (checksums or [])}
+        for filename, digest in zip(filenames, digests):
+            expected_digest = expected.get(os.path.basename(filename))
+            if expected_digest is None:
+                raise DudFileException('No checksum found for file {}'.format(filename))
+
+            if not digest == expected_digest:
                 raise DudFileException(
                     'Checksum mismatch for file %s: %s != %s' % (
                         filename,
-                        hash_type.hexdigest(),
-                        changed_files[field_name]
+                        digest,
+                        expected_digest
                     ))
@@ -107,6 +107,7 @@ class LocalConfig:
             db_name = jdb.get('db', 'laniakea')
             db_user = jdb.get('user', 'laniakea-user')
             db_password = jdb.get('password', '')
+            self._database_pool_size = int(jdb.get('pool_size', 8))
 
             self._database_url = 'postgresql://{user}:{password}@{host}:{port}/{dbname}'.format(user=db_user,
                                                                                                 password=db_password,
@@ -164,6 +165,10 @@ class LocalConfig:
         def database_url(self) -> str:
             return self._database_url
 
+        @property
+        def database_pool_size(self) -> int:
+            return self._database_pool_size
+
         @property
         def archive_root_dir(self) -> str:
             return self._archive_root_dir
@@ -18,9 +18,17 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import re
+import json
+import hashlib
+import requests
+from requests.adapters import HTTPAdapter
+from sys import intern
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 from apt_pkg import TagFile, TagSection, sha256sum, version_compare
 from laniakea.utils import is_remote_url, download_file, split_strip
-from laniakea.utils.gpg import SignedFile
+from laniakea.utils.gpg import SignedFile, GpgException
 from laniakea.localconfig import LocalConfig
 from laniakea.db import ArchiveFile, SourcePackage, BinaryPackage, PackageInfo, DebType, \
     packagepriority_from_string, debtype_from_string, ArchiveSuite, ArchiveComponent, ArchiveArchitecture, \
@@ -28,22 +36,29 @@ from laniakea.db import ArchiveFile, SourcePackage, BinaryPackage, PackageInfo,
 from laniakea.logging import log
 
 
+# matches the "Source" field of binary packages, e.g. "foo" or "foo (1.0-1)"
+_SOURCE_FIELD_RE = re.compile(r'^\s*([^\s(]+)\s*(?:\(\s*([^)\s]+)\s*\))?')
+
+# matches one entry of an "Uploaders" field, where names may be quoted and contain commas,
+# e.g. "Jane Doe <jane@example.org>, \"Doe, John\" <john@example.org>"
+_UPLOADERS_RE = re.compile(r'(?:"[^"]*"|[^,\s])(?:"[^"]*"|[^,])*')
+
+# matches one line of a checksums field, e.g. "<sha256sum> 2455 0ad_0.0.20-1.dsc"
+_CHECKSUM_LINE_RE = re.compile(r'^[ \t]*(\S+) +(\d+) +(\S+)[ \t]*$', re.MULTILINE)
+
+
 def parse_checksums_list(data, base_dir=None):
     files = []
     if not data:
         return files
-    for line in data.split('\n'):
-        parts = split_strip(line, ' ')  # f43923ace1c558ad9f9fa88eb3f1764a8c0379013aafbc682a35769449fe8955 2455 0ad_0.0.20-1.dsc
-        if len(parts) != 3:
-            continue
 
+    # all files share the same directory, so we only need to build the path prefix once
+    fname_prefix = os.path.join(base_dir, '') if base_dir else ''
+    for checksum, size, fname in _CHECKSUM_LINE_RE.findall(data):
         af = ArchiveFile()
-        af.sha256sum = parts[0]
-        af.size = int(parts[1])
-        if not base_dir:
-            af.fname = parts[2]
-        else:
-            af.fname = os.path.join(base_dir, parts[2])
+        af.sha256sum = checksum
+        af.size = int(size)
+        af.fname = fname_prefix + fname
 
         files.append(af)
 
@@ -94,13 +109,45 @@ def version_revision(version: str, full_for_native: bool = True) -> str:
     return version[idx + 1:]
 
 
+def _mtime_ns(fname):
+    try:
+        return os.stat(fname).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_verified_inrelease_cache(fname, cache_key):
+    '''
+    Return the verified SHA256 checksum list of an InRelease file from the
+    cache, or None if the cache does not match :cache_key.
+    '''
+    try:
+        with open(fname, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('key') != cache_key:
+        return None
+    return data.get('files_raw')
+
+
+def _write_verified_inrelease_cache(fname, cache_key, files_raw):
+    tmp_fname = fname + '.new'
+    with open(tmp_fname, 'w') as f:
+        json.dump({'key': cache_key, 'files_raw': files_raw}, f)
+    os.replace(tmp_fname, fname)
+
+
 class Repository:
     '''
     Allows reading data from a Debian repository.
     '''
 
     class InReleaseData:
-        files = []
+        def __init__(self, files=None):
+            self.files = files if files else []
+            # index the files by name, as index files are looked up very often
+            self.files_by_name = {af.fname: af for af in self.files}
 
     def __init__(self, location, repo_name=None, trusted_keyrings=[], entity=None):
         lconf = LocalConfig()
@@ -124,6 +171,8 @@ class Repository:
             self._repo_entity = ArchiveRepository(self._name)
 
         self._inrelease = {}  # dict of str->InReleaseData
+        self._http = None
+        self._sha256_cache = {}  # dict of str->(mtime, size, SHA256 hexdigest)
 
     @property
     def base_dir(self) -> str:
@@ -146,9 +195,24 @@ class Repository:
         if self._trusted:
             log.debug('Explicitly marked repository "{}" as trusted.'.format(self.location))
 
-    def _fetch_repo_file_internal(self, location, check=False):
+    def _http_session(self):
+        '''
+        Get the HTTP session used for all downloads from this repository,
+        so connections to the mirror are kept alive and reused.
+        '''
+        if not self._http:
+            self._http = requests.Session()
+            # allow one connection per thread fetching index files in parallel
+            adapter = HTTPAdapter(pool_maxsize=8)
+            self._http.mount('http://', adapter)
+            self._http.mount('https://', adapter)
+        return self._http
+
+    def _fetch_repo_file_internal(self, location, check=False, conditional=False):
         '''
         Download a file and retrieve a filename.
+        If :conditional is set, an existing cached copy is only replaced if the
+        file was modified on the server.
 
         This function does not validate the result, this step
         has to be done by the caller.
@@ -158,7 +222,18 @@ class Repository:
             target_fname = os.path.join(self._root_dir, location)
             os.makedirs(os.path.dirname(target_fname), exist_ok=True)
 
-            download_file(source_url, target_fname, check=check)
+            hasher = hashlib.sha256()
+            status = download_file(source_url,
+                                   target_fname,
+                                   check=check,
+                                   conditional=conditional,
+                                   hasher=hasher,
+                                   session=self._http_session())
+            if status == 200:
+                # the file was hashed while it was downloaded, so validating it
+                # later does not need to read it again
+                st = os.stat(target_fname)
+                self._sha256_cache[target_fname] = (st.st_mtime_ns, st.st_size, hasher.hexdigest())
             return target_fname
         else:
             fname = os.path.join(self._root_dir, location)
@@ -169,6 +244,20 @@ class Repository:
         log.error('Could not find repository file "{}"'.format(location))
         return None
 
+    def _file_sha256sum(self, fname) -> str:
+        '''
+        Get the SHA256 checksum of a file, only hashing it again if it was modified.
+        '''
+        st = os.stat(fname)
+        cached = self._sha256_cache.get(fname)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        with open(fname, 'rb') as f:
+            sha256h = sha256sum(f)
+        self._sha256_cache[fname] = (st.st_mtime_ns, st.st_size, sha256h)
+        return sha256h
+
     def get_file(self, afile, check=True) -> str:
         '''
         Get a file from the repository.
@@ -178,23 +267,16 @@ class Repository:
 
         fname = self._fetch_repo_file_internal(afile.fname, check=True)
         if check:
-            with open(fname, 'rb') as f:
-                sha256h = sha256sum(f)
-                if sha256h != afile.sha256sum:
-                    raise Exception('Checksum validation of "{}" failed ({} != {}).'.format(fname, sha256h, afile.sha256sum))
+            sha256h = self._file_sha256sum(fname)
+            if sha256h != afile.sha256sum:
+                raise Exception('Checksum validation of "{}" failed ({} != {}).'.format(fname, sha256h, afile.sha256sum))
 
         return fname
 
-    def _read_repo_information(self, suite_name, check=True):
-        if suite_name in self._inrelease:
-            return self._inrelease[suite_name]
-
-        irfname = self._fetch_repo_file_internal(os.path.join('dists', suite_name, 'InRelease'))
-        if not irfname:
-            if check:
-                raise Exception('Unable to find InRelease data for repository "{}"'.format(self.location))
-            return Repository.InReleaseData()
-
+    def _read_verified_inrelease_files(self, irfname):
+        '''
+        Verify the InRelease file :irfname and return the raw data of its SHA256 field.
+        '''
         with open(irfname, 'rb') as irf:
             contents = irf.read()
 
@@ -205,23 +287,66 @@ class Repository:
             # TODO: Maybe we should change the code to simply *always* validate everything?
             require_signature = False
 
-        sf = SignedFile(contents, self._keyrings, require_signature=require_signature)
-        contents = sf.contents
+        # for remote repositories, we remember the verified data of the cached InRelease
+        # file, so unchanged files do not need to be verified by GPG again
+        verified_cache_fname = None
+        files_raw = None
+        if self._repo_url:
+            verified_cache_fname = irfname + '.verified.json'
+            # the checksum was already computed while downloading the file, and the
+            # keyring modification times invalidate the cache if a keyring was updated
+            cache_key = {'sha256': self._file_sha256sum(irfname),
+                         'keyrings': [[k, _mtime_ns(k)] for k in sorted(self._keyrings)],
+                         'require_signature': require_signature}
+            files_raw = _read_verified_inrelease_cache(verified_cache_fname, cache_key)
+
+        if files_raw is None:
+            sf = SignedFile(contents, self._keyrings, require_signature=require_signature)
+            contents = sf.contents
+
+            section = TagSection(contents)
+            files_raw = section['SHA256']
+            if verified_cache_fname:
+                _write_verified_inrelease_cache(verified_cache_fname, cache_key, files_raw)
+
+        return files_raw
+
+    def _read_repo_information(self, suite_name, check=True):
+        if suite_name in self._inrelease:
+            return self._inrelease[suite_name]
+
+        irlocation = os.path.join('dists', suite_name, 'InRelease')
+        irfname = self._fetch_repo_file_internal(irlocation, conditional=True)
+        if not irfname:
+            if check:
+                raise Exception('Unable to find InRelease data for repository "{}"'.format(self.location))
+            return Repository.InReleaseData()
 
-        section = TagSection(contents)
-        ird = Repository.InReleaseData()
+        try:
+            files_raw = self._read_verified_inrelease_files(irfname)
+        except (GpgException, KeyError, ValueError) as e:
+            if not self._repo_url:
+                raise
+            # the cached copy may be damaged, in which case the server would keep telling
+            # us it was not modified - so fetch it again unconditionally
+            log.warning('Unable to verify cached InRelease file "{}", downloading it again: {}'.format(irfname, str(e)))
+            irfname = self._fetch_repo_file_internal(irlocation, check=True)
+            files_raw = self._read_verified_inrelease_files(irfname)
 
-        files_raw = section['SHA256']
-        ird.files = parse_checksums_list(files_raw)
+        ird = Repository.InReleaseData(parse_checksums_list(files_raw))
 
         self._inrelease[suite_name] = ird
         return ird
 
-    def index_file(self, suite, fname, check=True):
+    def index_file(self, suite, fname, check=True, prefer_uncompressed=False):
         '''
         Retrieve a package list (index) file from the repository.
         The file will be downloaded if necessary:
 
+        If :prefer_uncompressed is set and the repository is local, the uncompressed
+        variant of a compressed index is returned instead, if InRelease lists it.
+        The caller must be able to read both.
+
         Returns: A file path to the index file.
         '''
         if type(suite) is ArchiveSuite:
@@ -230,36 +355,31 @@ class Repository:
             suite_name = suite
 
         ird = self._read_repo_information(suite_name)
+        if prefer_uncompressed and not self._repo_url:
+            # reading a local uncompressed file is much cheaper than decompressing it
+            # while parsing, downloads are still done compressed though
+            plain_fname = os.path.splitext(fname)[0]
+            if plain_fname != fname and plain_fname in ird.files_by_name:
+                if os.path.isfile(os.path.join(self._root_dir, 'dists', suite_name, plain_fname)):
+                    fname = plain_fname
+
         index_fname = self._fetch_repo_file_internal(os.path.join('dists', suite_name, fname))
         if not index_fname:
             return None
 
         # validate the file
-        with open(index_fname, 'rb') as f:
-            index_sha256sum = sha256sum(f)
+        index_sha256sum = self._file_sha256sum(index_fname)
 
-        valid = False
-        for af in ird.files:
-            if af.fname == fname:
-                if index_sha256sum != af.sha256sum:
-                    raise Exception('Checksum validation of "{}" failed ({} != {})'.format(fname, index_sha256sum, af.sha256sum))
-                valid = True
+        af = ird.files_by_name.get(fname)
+        if af and index_sha256sum != af.sha256sum:
+            raise Exception('Checksum validation of "{}" failed ({} != {})'.format(fname, index_sha256sum, af.sha256sum))
 
-        if not valid and check:
+        if not af and check:
             raise Exception('Unable to validate "{}": File not mentioned in InRelease.'.format(fname))
 
         return index_fname
 
-    def source_packages(self, suite, component):
-        ''' Return a list of all source packages in the given suite and component. '''
-        assert type(suite) is ArchiveSuite
-        assert type(component) is ArchiveComponent
-
-        index_fname = self.index_file(suite.name, os.path.join(component.name, 'source', 'Sources.xz'))
-        if not index_fname:
-            return []
-
-        pkgs = []
+    def _read_source_packages(self, index_fname, suite, component):
         with TagFile(index_fname) as tf:
             for e in tf:
                 pkgname = e['Package']
@@ -277,13 +397,13 @@ class Repository:
 
                 pkg.version = pkgversion
                 pkg.architectures = split_strip(e['Architecture'], ' ')
-                pkg.standards_version = e.get('Standards-Version', '0~notset')
-                pkg.format_version = e['Format']
+                pkg.standards_version = intern(e.get('Standards-Version', '0~notset'))
+                pkg.format_version = intern(e['Format'])
 
                 pkg.vcs_browser = e.get('Vcs-Browser')
                 pkg.homepage = e.get('Homepage')
-                pkg.maintainer = e['Maintainer']
-                pkg.uploaders = split_strip(e.get('Uploaders', ''), ',')  # FIXME: Careful! Splitting just by comma isn't enough! We need to parse this properly.
+                pkg.maintainer = intern(e['Maintainer'])
+                pkg.uploaders = [u.strip() for u in _UPLOADERS_RE.findall(e.get('Uploaders', ''))]
 
                 pkg.build_depends = split_strip(e.get('Build-Depends', ''), ',')
                 pkg.directory = e['Directory']
@@ -300,7 +420,7 @@ class Repository:
                         pi = PackageInfo()
                         pi.deb_type = DebType.DEB
                         pi.name = bpname
-                        pi.ver = pkg.version
+                        pi.version = pkg.version
                         binaries.append(pi)
                 else:
                     binaries = parse_package_list_str(raw_pkg_list, pkg.version)
@@ -310,29 +430,41 @@ class Repository:
                 if not pkg.files and pkg.format_version != '1.0':
                     log.warning('Source package {}/{} seems to have no files (in {}).'.format(pkg.name, pkg.version, self.location))
 
-                # add package to results set
                 pkg.update_uuid()
-                pkgs.append(pkg)
+                yield pkg
 
-        return pkgs
+    def source_packages(self, suite, component):
+        '''
+        Return an iterator over all source packages in the given suite and component.
+        The index file is fetched and validated immediately, packages are read lazily.
+        '''
+        assert type(suite) is ArchiveSuite
+        assert type(component) is ArchiveComponent
+
+        index_fname = self.index_file(suite.name, os.path.join(component.name, 'source', 'Sources.xz'),
+                                      prefer_uncompressed=True)
+        if not index_fname:
+            return iter([])
+
+        return self._read_source_packages(index_fname, suite, component)
 
     def _read_binary_packages_from_tf(self, tf, tf_fname, suite, component, arch, deb_type):
         requested_arch_is_all = arch.name == 'all'
 
-        pkgs = []
         for e in tf:
+            arch_name = e['Architecture']
+
+            # we deal with arch:all packages separately, so skip them before
+            # looking at any other field
+            if not requested_arch_is_all and arch_name == 'all':
+                continue
+
             pkgname = e['Package']
             pkgversion = e['Version']
             if not pkgname or not pkgversion:
                 raise Exception('Found invalid block (no Package and Version fields) in Packages file "{}".'.format(tf_fname))
                 break
 
-            arch_name = e['Architecture']
-
-            # we deal with arch:all packages separately
-            if not requested_arch_is_all and arch_name == 'all':
-                continue
-
             # sanity check
             if arch_name != arch.name:
                 log.warning('Found package "{}::{}/{}" with unexpeced architecture "{}" (expected "{}")'.format(self._name, pkgname, pkgversion, arch_name, arch.name))
@@ -346,18 +478,16 @@ class Repository:
                 pkg.suites.append(suite)
 
             pkg.architecture = arch
-            pkg.maintainer = e['Maintainer']
+            pkg.maintainer = intern(e['Maintainer'])
 
             source_id = e.get('Source')
             if not source_id:
                 pkg.source_name = pkg.name
                 pkg.source_version = pkg.version
-            elif '(' in source_id:
-                pkg.source_name = source_id[0:source_id.index('(') - 1].strip()
-                pkg.source_version = source_id[source_id.index('(') + 1:source_id.index(')')].strip()
             else:
-                pkg.source_name = source_id
-                pkg.source_version = pkg.version
+                m = _SOURCE_FIELD_RE.match(source_id)
+                pkg.source_name = intern(m.group(1))
+                pkg.source_version = m.group(2) or pkg.version
 
             pkg.size_installed = int(e.get('Installed-Size', '0'))
 
@@ -365,7 +495,7 @@ class Repository:
             pkg.pre_depends = split_strip(e.get('Pre-Depends', ''), ',')
 
             pkg.homepage = e.get('Homepage')
-            pkg.section = e['Section']
+            pkg.section = intern(e['Section'])
 
             pkg.description = e['Description']
             pkg.description_md5 = e.get('Description-md5')
@@ -385,15 +515,21 @@ class Repository:
             if not pkg.bin_file.fname:
                 log.warning('Binary package "{}/{}/{}" seems to have no files.'.format(pkg.name, pkg.version, arch.name))
 
-            # update UUID and add package to results set
             pkg.update_uuid()
-            pkgs.append(pkg)
+            yield pkg
 
-        return pkgs
+    def _read_binary_packages(self, index_fname, suite, component, arch, deb_type):
+        with TagFile(index_fname) as tf:
+            yield from self._read_binary_packages_from_tf(tf,
+                                                          index_fname,
+                                                          suite,
+                                                          component,
+                                                          arch,
+                                                          deb_type)
 
     def binary_packages(self, suite, component, arch):
         '''
-        Get a list of binary package information for the given repository suite,
+        Get an iterator over binary package information for the given repository suite,
         component and architecture.
         '''
 
@@ -401,21 +537,16 @@ class Repository:
         assert type(component) is ArchiveComponent
         assert type(arch) is ArchiveArchitecture
 
-        index_fname = self.index_file(suite.name, os.path.join(component.name, 'binary-{}'.format(arch.name), 'Packages.xz'))
+        index_fname = self.index_file(suite.name, os.path.join(component.name, 'binary-{}'.format(arch.name), 'Packages.xz'),
+                                      prefer_uncompressed=True)
         if not index_fname:
-            return []
+            return iter([])
 
-        with TagFile(index_fname) as tf:
-            return self._read_binary_packages_from_tf(tf,
-                                                      index_fname,
-                                                      suite,
-                                                      component,
-                                                      arch,
-                                                      DebType.DEB)
+        return self._read_binary_packages(index_fname, suite, component, arch, DebType.DEB)
 
     def installer_packages(self, suite, component, arch):
         '''
-        Get a list of binary installer packages for the given repository suite, component
+        Get an iterator over binary installer packages for the given repository suite, component
         and architecture.
         These binary packages are typically udebs used by the debian-installer, and should not
         be installed on an user's system.
@@ -425,17 +556,44 @@ class Repository:
         assert type(component) is ArchiveComponent
         assert type(arch) is ArchiveArchitecture
 
-        index_fname = self.index_file(suite.name, os.path.join(component.name, 'debian-installer', 'binary-{}'.format(arch.name), 'Packages.xz'))
+        index_fname = self.index_file(suite.name, os.path.join(component.name, 'debian-installer', 'binary-{}'.format(arch.name), 'Packages.xz'),
+                                      prefer_uncompressed=True)
         if not index_fname:
-            return []
+            return iter([])
 
-        with TagFile(index_fname) as tf:
-            return self._read_binary_packages_from_tf(tf,
-                                                      index_fname,
-                                                      suite,
-                                                      component,
-                                                      arch,
-                                                      DebType.UDEB)
+        return self._read_binary_packages(index_fname, suite, component, arch, DebType.UDEB)
+
+    def binary_packages_all(self, suite, components, arches, with_installer=False):
+        '''
+        Get an iterator over binary package information for all given components
+        and architectures of a repository suite.
+        The index files are fetched and validated in parallel, packages are read lazily.
+        '''
+
+        assert type(suite) is ArchiveSuite
+
+        index_dirs = [('binary-{}', DebType.DEB)]
+        if with_installer:
+            index_dirs.append((os.path.join('debian-installer', 'binary-{}'), DebType.UDEB))
+
+        jobs = []
+        for dir_tmpl, deb_type in index_dirs:
+            for component in components:
+                for arch in arches:
+                    index_path = os.path.join(component.name, dir_tmpl.format(arch.name), 'Packages.xz')
+                    jobs.append((component, arch, deb_type, index_path))
+        if not jobs:
+            return iter([])
+
+        # read the InRelease file once, before the index files are fetched concurrently
+        self._read_repo_information(suite.name)
+        with ThreadPoolExecutor(max_workers=min(len(jobs), 8)) as executor:
+            index_fnames = list(executor.map(lambda job: self.index_file(suite.name, job[3], prefer_uncompressed=True),
+                                             jobs))
+
+        return chain.from_iterable(self._read_binary_packages(index_fname, suite, component, arch, deb_type)
+                                   for (component, arch, deb_type, _), index_fname in zip(jobs, index_fnames)
+                                   if index_fname)
 
 
 def make_newest_packages_dict(pkgs):
@@ -448,7 +606,9 @@ def make_newest_packages_dict(pkgs):
     for pkg in pkgs:
         epkg = res.get(pkg.name)
         if epkg:
-            if version_compare(pkg.version, epkg.version) > 0:
+            # most duplicates carry the very same version, which we can
+            # detect without parsing the version strings
+            if pkg.version != epkg.version and version_compare(pkg.version, epkg.version) > 0:
                 res[pkg.name] = pkg
         else:
             res[pkg.name] = pkg
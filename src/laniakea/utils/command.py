@@ -88,21 +88,21 @@ def run_forwarded(command, cwd=None, print_output=True):
     if not isinstance(command, list):
         command = shlex.split(command)
 
-    output = ''
+    output_lines = []
     proc = subprocess.Popen(command,
                             cwd=cwd,
                             stdout=subprocess.PIPE,
                             stderr=subprocess.STDOUT)
-    while True:
-        line = proc.stdout.readline()
-        if proc.poll() is not None:
-            break
-        line_str = str(line, 'utf-8', 'replace')
-        output = output + line_str
-        if print_output:
-            sys.stdout.write(line_str)
-
-    return (output, proc.returncode)
+    with proc.stdout:
+        # consume the pipe until EOF, so no output is lost when the process exits
+        for line in proc.stdout:
+            line_str = str(line, 'utf-8', 'replace')
+            output_lines.append(line_str)
+            if print_output:
+                sys.stdout.write(line_str)
+    proc.wait()
+
+    return (''.join(output_lines), proc.returncode)
 
 
 def safe_run_forwarded(command, expected=0, cwd=None, print_output=True):
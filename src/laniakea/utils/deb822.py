@@ -47,15 +47,18 @@ class Changes(Changes_):
             'Checksums-Sha256': 'sha256',
         }
 
+        # read the file only once and feed every chunk to all hash functions
+        hashes = {key: hashlib.new(algo) for key, algo in algos.items()}
+        with open(fp, 'rb') as fd:
+            for chunk in iter((lambda: fd.read(1024 * 1024)), b''):
+                for m in hashes.values():
+                    m.update(chunk)
+
         for key, algo in algos.items():
             if key not in self:
                 self[key] = []
 
-            m = hashlib.new(algo)
-            with open(fp, 'rb') as fd:
-                for chunk in iter((lambda: fd.read(128 * m.block_size)), b''):
-                    m.update(chunk)
-
+            m = hashes[key]
             if key != 'Files':
                 self[key].append({
                     algo: m.hexdigest(),
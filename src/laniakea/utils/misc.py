@@ -19,8 +19,10 @@
 
 import os
 import re
+import threading
 import requests
 from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
 
 
 def get_dir_shorthand_for_uuid(uuid):
@@ -82,15 +84,46 @@ def is_remote_url(uri):
     return uriregex.match(uri) is not None
 
 
-def download_file(url, fname, check=False, headers={}, **kwargs):
+def download_file(url, fname, check=False, headers={}, conditional=False, hasher=None, session=None, **kwargs):
+    '''
+    Download :url to :fname.
+    If :conditional is set and :fname exists, the file is only downloaded again if it
+    was modified on the server since; a HTTP 304 status is returned otherwise.
+    If a hashlib object is passed as :hasher, it is updated with the downloaded data.
+    Pass a requests.Session as :session to reuse its connections.
+    '''
     hdr = {'user-agent': 'laniakea/0.0.1'}
+    if conditional and os.path.isfile(fname):
+        hdr['if-modified-since'] = formatdate(os.path.getmtime(fname), usegmt=True)
     hdr.update(headers)
 
-    r = requests.get(url, stream=True, headers=hdr, **kwargs)
+    r = (session if session else requests).get(url, stream=True, headers=hdr, **kwargs)
     if r.status_code == 200:
-        with open(fname, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=1024):
-                f.write(chunk)
+        # write to a temporary file first, so an interrupted transfer never leaves
+        # a truncated file behind that a later conditional request would keep
+        tmp_fname = '{}.{}-{}.part'.format(fname, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_fname, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+
+            # use the server's modification time, so conditional requests compare against it
+            last_modified = r.headers.get('last-modified')
+            if last_modified:
+                try:
+                    mtime = parsedate_to_datetime(last_modified).timestamp()
+                    os.utime(tmp_fname, (mtime, mtime))
+                except (TypeError, ValueError):
+                    pass
+            os.replace(tmp_fname, fname)
+        except BaseException:
+            if os.path.exists(tmp_fname):
+                os.remove(tmp_fname)
+            raise
+        return r.status_code
+    if r.status_code == 304 and conditional:
         return r.status_code
 
     if check:
@@ -123,8 +156,6 @@ def open_compressed(fname, mode='rb'):
 
 def split_strip(s, sep):
     ''' Split a string, removing empty segments from the result and stripping the individual parts '''
-    res = []
-    for part in s.split(sep):
-        if part:
-            res.append(part.strip())
-    return res
+    if not s:
+        return []
+    return [part.strip() for part in s.split(sep) if part]
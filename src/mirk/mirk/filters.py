@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2019-2020 Matthias Klumpp <matthias@tenstral.net>
+#
+# Licensed under the GNU Lesser General Public License Version 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the license, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+from fnmatch import translate
+
+__all__ = ['compile_filter_rules',
+           'event_filter_data',
+           'filter_rules_match_event']
+
+
+def _compile_rule(rule):
+    '''
+    Create a matcher function for a single filter :rule, with all of its
+    shell-style patterns translated into compiled regular expressions.
+    '''
+    checks = []
+    for key, fentry in rule.items():
+        patterns = fentry if type(fentry) is list else [fentry]
+        # an empty pattern list never matches
+        checks.append((key, re.compile('|'.join(translate(p) for p in patterns) if patterns else '(?!)').match))
+
+    def matcher(flat_data):
+        # a rule matches if at least one value was checked and none failed
+        matched = False
+        for key, pmatch in checks:
+            values = flat_data.get(key)
+            if not values:
+                continue  # we can ignore this rule here
+            for value in values:
+                if pmatch(value) is None:
+                    return False
+            matched = True
+        return matched
+
+    return matcher
+
+
+def compile_filter_rules(rules):
+    '''
+    Convert the filter :rules into a list of matcher functions, so the
+    patterns don't have to be translated again for every event.
+    A list of patterns is combined into a single expression matching any of them.
+    '''
+    return [_compile_rule(rule) for rule in rules]
+
+
+def _as_str_values(value):
+    # only string values are matched, anything else is ignored
+    if type(value) is str:
+        return (value,) if value else ()
+    if type(value) is list:
+        return tuple(v for v in value if type(v) is str)
+    return ()
+
+
+def event_filter_data(event):
+    '''
+    Create a flat structure of the data in :event for matching against
+    filter rules, with every value normalized to a tuple of strings.
+    '''
+    flat_data = {key: _as_str_values(value) for key, value in event['data'].items()}
+    flat_data['tag'] = _as_str_values(event['tag'])
+    return flat_data
+
+
+def filter_rules_match_event(rules, flat_data):
+    '''
+    Check if our compiled filter rules :rules match the event data
+    :flat_data, as created by event_filter_data()
+    '''
+    return any(matcher(flat_data) for matcher in rules)
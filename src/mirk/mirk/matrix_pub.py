@@ -22,64 +22,106 @@ import sys
 import zmq
 import json
 import logging as log
-from fnmatch import fnmatch
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
 from laniakea.msgstream import create_event_listen_socket, verify_event_message, event_message_is_valid_and_signed
 from matrix_client.client import MatrixClient
 from matrix_client.api import MatrixRequestError
 from .config import MirkConfig
 from .messages import message_templates, message_prestyle_event_data
+from .filters import compile_filter_rules, event_filter_data, filter_rules_match_event
+
+try:
+    import orjson
+
+    # orjson parses the raw message bytes directly and is a lot faster than json
+    _json_loads = orjson.loads
+
+    def _json_dumps_canonical(data):
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+    def _json_dumps_text(data):
+        return orjson.dumps(data, default=str, option=orjson.OPT_SORT_KEYS).decode('utf-8')
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps_canonical(data):
+        return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+    def _json_dumps_text(data):
+        return json.dumps(data, default=str, sort_keys=True)
 
 
 class RoomSettings:
     filter_rules = []
 
 
-def filter_entry_matches(fentry, data):
-    if type(fentry) is list:
-        for fe in fentry:
-            if fnmatch(data, fe):
-                return True
-        return False
-    else:
-        return fnmatch(data, fentry)
+_message_template_get = message_templates.get
 
 
-def filter_rules_match_event(rules, event):
+def render_html_message(tag, event, sdata_base):
     '''
-    Check if our filter rules :rules match the data present
-    in :event
+    Convert the JSON message into a nice HTML string for display.
+    The constant values of :sdata_base are available to all templates.
     '''
 
-    # create a flatter data structure for easy matching
-    flat_data = event['data']
-    flat_data['tag'] = event['tag']
-
-    # we have filter rules
-    rule_matched = False
-    for rule in rules:
-        match_okay = False
-        for key, filter_value in rule.items():
-            event_value = flat_data.get(key)
-            if not event_value:
-                continue  # we can ignore this rule here
-            if type(event_value) is str:
-                match_okay = filter_entry_matches(filter_value, event_value)
-                if not match_okay:
-                    break
-            elif type(event_value) is list:
-                for evs in event_value:
-                    if not type(evs) is str:
-                        continue
-                    match_okay = filter_entry_matches(filter_value, evs)
-                    if not match_okay:
-                        break
-                if not match_okay:
-                    break
-        if match_okay:
-            rule_matched = True
+    sdata = message_prestyle_event_data({**event, **sdata_base})
+
+    text = ''
+    templ = _message_template_get(tag)
+    if templ:
+        try:
+            if callable(templ):
+                text = templ(tag, sdata)
+            else:
+                text = templ.format(**sdata)
+        except Exception as e:
+            text = '[<font color="#ed1515">FORMATTING_FAILED</font>] ' + str(e) + ' :: ' + _json_dumps_text(sdata)
+    else:
+        text = 'Received event type <code>{}</code> with data <code>{}</code>'.format(tag, _json_dumps_text(event))
+
+    return text
+
+
+def decode_verify_event(msg_b, trusted_keys):
+    '''
+    Decode the raw message :msg_b and check its signatures against :trusted_keys.
+    Returns the event and whether it was signed by a trusted key, or a None
+    event if the message was invalid.
+    '''
+    try:
+        event = _json_loads(msg_b)
+    except ValueError as e:
+        # we ignore invalid requests
+        if log.getLogger().isEnabledFor(log.INFO):
+            # only decode as much of the payload as is useful to show
+            msg_s = str(msg_b[:512], 'utf-8', 'replace')
+            log.info('Received invalid JSON message: %s (%s)', msg_s if len(msg_s) > 1 else msg_b, e)
+        return None, False
+
+    # check if the message is actually valid and can be processed
+    if not event_message_is_valid_and_signed(event):
+        # we currently just silently ignore invalid submissions, no need to spam
+        # the logs in case some bad actor flood server with spam
+        return None, False
+
+    signatures = event.get('signatures')
+    # only signers we actually trust are worth verifying; we check them in the
+    # event's own order, so the result never depends on set iteration order
+    for signer in signatures:
+        if signer not in trusted_keys:
+            continue
+        try:
+            verify_event_message(signer, event, trusted_keys[signer], assume_valid=True)
+        except Exception as e:
+            log.info('Invalid signature on event (%s): %s', e, event)
             break
 
-    return rule_matched
+        # if we are here, we verified a signature without issues, which means
+        # the message is legit and we can sign it ourselves and publish it
+        return event, True
+
+    return event, False
 
 
 class MatrixPublisher:
@@ -88,7 +130,6 @@ class MatrixPublisher:
     '''
 
     def __init__(self):
-        from glob import glob
         from laniakea.localconfig import LocalConfig
         from laniakea.msgstream import keyfile_read_verify_key
 
@@ -100,94 +141,91 @@ class MatrixPublisher:
         # Read all the keys that we trust, to verify messages
         # TODO: Implement auto-reloading of valid keys list if directory changes
         self._trusted_keys = {}
-        for keyfname in glob(os.path.join(LocalConfig().trusted_curve_keys_dir, '*')):
-            signer_id, verify_key = keyfile_read_verify_key(keyfname)
-            if signer_id and verify_key:
-                self._trusted_keys[signer_id] = verify_key
+        try:
+            with os.scandir(LocalConfig().trusted_curve_keys_dir) as it:
+                for entry in it:
+                    if entry.name.startswith('.') or not entry.is_file():
+                        continue
+                    signer_id, verify_key = keyfile_read_verify_key(entry.path)
+                    if signer_id and verify_key:
+                        self._trusted_keys[signer_id] = verify_key
+        except FileNotFoundError:
+            log.warning('Trusted keys directory does not exist, can not verify any signatures.')
 
-    def _tag_data_to_html_message(self, tag, event):
-        ''' Convert the JSON message into a nice HTML string for display. '''
+        # data available to every message template
+        self._sdata_base = {'url_webswview': self._mconf.webswview_url,
+                            'url_webview': self._mconf.webview_url}
+        self._render_html_message_cached = lru_cache(maxsize=1024)(self._render_html_message_from_key)
 
-        sdata = event.copy()
-        sdata['url_webswview'] = self._mconf.webswview_url
-        sdata['url_webview'] = self._mconf.webview_url
+        # decoding and signature verification of received messages happens here,
+        # overlapping with publishing the messages that came before
+        self._verify_executor = ThreadPoolExecutor(max_workers=2)
 
-        sdata = message_prestyle_event_data(sdata)
+    def _render_html_message_from_key(self, tag, data_key):
+        return render_html_message(tag, _json_loads(data_key), self._sdata_base)
 
-        text = ''
-        templ = message_templates.get(tag)
-        if templ:
-            try:
-                if callable(templ):
-                    text = templ(tag, sdata)
-                else:
-                    text = templ.format(**sdata)
-            except Exception as e:
-                text = '[<font color="#ed1515">FORMATTING_FAILED</font>] ' + str(e) + ' :: ' + str(sdata)
-        else:
-            text = 'Received event type <code>{}</code> with data <code>{}</code>'.format(tag, str(event))
+    def _tag_data_to_html_message(self, tag, event):
+        ''' Convert the JSON message into a nice HTML string for display. '''
 
-        return text
+        # identical events are frequently emitted in bursts, so we cache
+        # the rendered text keyed by the canonical JSON of the event data
+        try:
+            data_key = _json_dumps_canonical(event)
+        except (TypeError, ValueError):
+            return render_html_message(tag, event, self._sdata_base)
+        return self._render_html_message_cached(tag, data_key)
 
     def _on_room_message(self, room, event):
         pass
 
-    def _on_event_received(self, event):
+    def _on_event_received(self, event, signature_trusted):
         tag = event['tag']
         data = event['data']
 
-        signatures = event.get('signatures')
-        signature_trusted = False
-        for signer in signatures.keys():
-            key = self._trusted_keys.get(signer)
-            if not key:
-                continue
-            try:
-                verify_event_message(signer, event, key, assume_valid=True)
-            except Exception as e:
-                log.info('Invalid signature on event ({}): {}'.format(str(e), str(event)))
-                break
+        if not signature_trusted and not self._mconf.allow_unsigned:
+            log.info('Unable to verify signature on event: %s', event)
+            return
 
-            # if we are here, we verified a signature without issues, which means
-            # the message is legit and we can sign it ourselves and publish it
-            signature_trusted = True
-            break
+        # only render the message if any room wants to see it at all
+        target_rooms = self._rooms_matching_event(event)
+        if not target_rooms:
+            return
 
-        if signature_trusted:
-            text = self._tag_data_to_html_message(tag, data)
-        else:
-            if self._mconf.allow_unsigned:
-                text = self._tag_data_to_html_message(tag, data)
-                text = '[<font color="#ed1515">VERIFY_FAILED</font>] ' + text
-            else:
-                log.info('Unable to verify signature on event: {}'.format(str(event)))
-                return
-
-        self._rooms_publish_text(event, text)
-
-    def filter_entry_matches(fentry, data):
-        if type(fentry) is list:
-            for fe in fentry:
-                if fnmatch(data, fe):
-                    return True
-            return False
-        else:
-            if fnmatch(data, fentry):
-                return True
-            return False
-
-    def _rooms_publish_text(self, event, text):
+        text = self._tag_data_to_html_message(tag, data)
+        if not signature_trusted:
+            text = '[<font color="#ed1515">VERIFY_FAILED</font>] ' + text
+
+        self._rooms_publish_text(target_rooms, text)
+
+    def _rooms_matching_event(self, event):
+        ''' Get the list of rooms that the :event should be published in. '''
+
+        target_rooms = []
+        flat_data = None
         for room, settings in self._rooms.items():
             filter_rules = settings.filter_rules
             if not filter_rules:
                 # no filter rules means we emit everything
-                room.send_html(text)
+                target_rooms.append(room)
                 continue
 
-            # check if we are allowed to send this message to the particular room,
-            # and then send it
-            if filter_rules_match_event(filter_rules, event):
-                room.send_html(text)
+            # check if we are allowed to send this message to the particular room
+            if flat_data is None:
+                flat_data = event_filter_data(event)
+            if filter_rules_match_event(filter_rules, flat_data):
+                target_rooms.append(room)
+        return target_rooms
+
+    def _rooms_publish_text(self, rooms, text):
+        # send to all rooms concurrently, so a slow or failing room doesn't
+        # delay the others
+        submit = self._send_executor.submit
+        futures = [(room, submit(room.send_html, text)) for room in rooms]
+        for room, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                log.warning('Unable to send message to room %s: %s', room.room_id, str(e))
 
     def run(self):
         client = MatrixClient(self._mconf.host)
@@ -222,28 +260,26 @@ class MatrixPublisher:
             room.add_listener(self._on_room_message)
 
             settings = RoomSettings()
-            settings.filter_rules = rsdata.get('Filter', [])
+            settings.filter_rules = compile_filter_rules(rsdata.get('Filter', []))
 
             self._rooms[room] = settings
+        self._send_executor = ThreadPoolExecutor(max_workers=min(max(len(self._rooms), 1), 8))
 
         log.info('Logged into Matrix, ready to publish information')
         client.start_listener_thread()
 
         while True:
-            topic, msg_b = self._lhsub_socket.recv_multipart()
-            msg_s = str(msg_b, 'utf-8', 'replace')
-
-            try:
-                event = json.loads(msg_s)
-            except json.JSONDecodeError as e:
-                # we ignore invalid requests
-                log.info('Received invalid JSON message: %s (%s)', msg_s if len(msg_s) > 1 else msg_b, str(e))
-                continue
-
-            # check if the message is actually valid and can be processed
-            if not event_message_is_valid_and_signed(event):
-                # we currently just silently ignore invalid submissions, no need to spam
-                # the logs in case some bad actor flood server with spam
-                continue
+            # block for the next message, then drain everything that has queued up
+            # meanwhile, so bursts are handled without a poll round-trip per message
+            batch = [self._lhsub_socket.recv_multipart()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._lhsub_socket.recv_multipart(flags=zmq.NOBLOCK))
+                except zmq.Again:
+                    break
 
-            self._on_event_received(event)
+            results = self._verify_executor.map(partial(decode_verify_event, trusted_keys=self._trusted_keys),
+                                                [msg_b for topic, msg_b in batch])
+            for event, signature_trusted in results:
+                if event is not None:
+                    self._on_event_received(event, signature_trusted)
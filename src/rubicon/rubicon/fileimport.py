@@ -104,7 +104,17 @@ def accept_upload(conf, dud, event_emitter):
     # remove the upload description file from incoming
     os.remove(dud.get_dud_file())
 
-    log.info("Upload {} accepted.", dud.get_filename())
+    log.info('Upload %s accepted.', dud.get_filename())
+
+
+def _move_to_rejected(fname, target_fname, suffix):
+    '''
+    Move a file to the rejected queue without replacing an existing file there.
+    '''
+    try:
+        return safe_rename(fname, target_fname, exclusive=True)
+    except FileExistsError:
+        return safe_rename(fname, target_fname + '+' + suffix)
 
 
 def reject_upload(conf, dud, reason='Unknown', event_emitter=None):
@@ -118,23 +128,17 @@ def reject_upload(conf, dud, reason='Unknown', event_emitter=None):
     random_suffix = random_string(4)
     for fname in dud.get_files():
         target_fname = os.path.join(conf.rejected_dir, os.path.basename(fname))
-        if os.path.isfile(target_fname):
-            target_fname = target_fname + '+' + random_suffix
-
-        # move the file to the rejected dir
-        safe_rename(fname, target_fname)
+        _move_to_rejected(fname, target_fname, random_suffix)
 
     # move the .dud file itself
     target_fname = os.path.join(conf.rejected_dir, dud.get_filename())
-    if os.path.isfile(target_fname):
-        target_fname = target_fname + '+' + random_suffix
-    safe_rename(dud.get_dud_file(), target_fname)
+    target_fname = _move_to_rejected(dud.get_dud_file(), target_fname, random_suffix)
 
     # also store the reject reason for future reference
     with open(target_fname + '.reason', 'w') as f:
         f.write(reason + '\n')
 
-    log.info('Upload {} rejected.', dud.get_filename())
+    log.info('Upload %s rejected.', dud.get_filename())
     if event_emitter:
         event_emitter.submit_event('upload-rejected', {'dud_filename': dud.get_filename(), 'reason': reason})
 
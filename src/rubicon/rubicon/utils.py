@@ -16,16 +16,59 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import errno
+from shutil import copy2, copyfileobj, copystat
 
 
-def safe_rename(src, dst):
+def _copy_exclusive(src, dst):
     '''
-    Instead of directly moving a file with rename(), copy the file
-    and then delete the original.
-    Also reset the permissions on the resulting copy.
+    Copy a file to a destination that must not exist yet.
     '''
+    with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+        copyfileobj(fsrc, fdst)
+    copystat(src, dst)
+    return dst
+
+
+def safe_rename(src, dst, exclusive=False):
+    '''
+    Move a file, resetting the permissions on the result.
+    Files we own are renamed if source and destination are on the same
+    filesystem. Otherwise the file is copied, so the result is owned by us
+    and its permissions can be reset, and the original is deleted.
+    If :exclusive is set, an existing destination is never replaced
+    and a FileExistsError is raised instead.
+    Returns the new filename.
+    '''
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    # a renamed file keeps its owner, and we could not change the permissions
+    # of a file uploaded by someone else
+    owned = os.stat(src).st_uid == os.getuid()
+
+    new_fname = None
+    try:
+        if owned and exclusive:
+            # unlike rename, link fails atomically if the destination exists
+            os.link(src, dst)
+            os.remove(src)
+            new_fname = dst
+        elif owned:
+            os.rename(src, dst)
+            new_fname = dst
+    except OSError as e:
+        # the filesystem may not support (enough) hard links, in which case we copy
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EMLINK):
+            raise
+
+    if not new_fname:
+        if exclusive:
+            new_fname = _copy_exclusive(src, dst)
+        else:
+            new_fname = copy2(src, dst)
+        os.remove(src)
 
-    from shutil import copy2
-    new_fname = copy2(src, dst)
     os.chmod(new_fname, 0o755)
-    os.remove(src)
+    return new_fname
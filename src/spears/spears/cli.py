@@ -78,17 +78,23 @@ def create_parser():
     return parser
 
 
+__parser = None
+
+
 def run(mainfile, args):
     global __mainfile
+    global __parser
     __mainfile = mainfile
 
     if len(args) == 0:
         print('Need a subcommand to proceed!')
         sys.exit(1)
 
-    parser = create_parser()
+    # the parser is only built once, even if we are run multiple times
+    if __parser is None:
+        __parser = create_parser()
 
-    args = parser.parse_args(args)
+    args = __parser.parse_args(args)
     check_print_version(args)
     check_verbose(args)
     args.func(args)
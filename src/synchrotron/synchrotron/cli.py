@@ -17,6 +17,7 @@
 
 import sys
 from argparse import ArgumentParser
+from sqlalchemy.orm import selectinload
 from laniakea import LkModule
 from laniakea.db import session_scope, SynchrotronConfig, SynchrotronIssue, SynchrotronSource
 from laniakea.logging import log
@@ -45,6 +46,7 @@ def command_autosync(options):
     with session_scope() as session:
         sync_sources = session.query(SynchrotronSource).all()
         autosyncs = session.query(SynchrotronConfig) \
+                           .options(selectinload(SynchrotronConfig.destination_suite)) \
                            .filter(SynchrotronConfig.sync_enabled == True) \
                            .filter(SynchrotronConfig.sync_auto_enabled == True).all()  # noqa: E712
 
@@ -61,16 +63,16 @@ def command_autosync(options):
                 return
 
             existing_sync_issues = {}
-            for ssource in sync_sources:
-                all_issues = session.query(SynchrotronIssue) \
-                                    .filter(SynchrotronIssue.source_suite == ssource.suite_name,
-                                            SynchrotronIssue.target_suite == autosync.destination_suite.name,
-                                            SynchrotronIssue.config_id == autosync.id) \
-                                    .all()
-                for eissue in all_issues:
-                    eid = '{}-{}-{}:{}'.format(eissue.package_name, eissue.source_version, eissue.target_version, str(eissue.kind))
-                    existing_sync_issues[eid] = eissue
-
+            all_issues = session.query(SynchrotronIssue) \
+                                .filter(SynchrotronIssue.source_suite.in_([s.suite_name for s in sync_sources]),
+                                        SynchrotronIssue.target_suite == autosync.destination_suite.name,
+                                        SynchrotronIssue.config_id == autosync.id) \
+                                .all()
+            for eissue in all_issues:
+                eid = '{}-{}-{}:{}'.format(eissue.package_name, eissue.source_version, eissue.target_version, str(eissue.kind))
+                existing_sync_issues[eid] = eissue
+
+            new_issues = []
             for info in issue_data:
                 eid = '{}-{}-{}:{}'.format(info.package_name, info.source_version, info.target_version, str(info.kind))
                 issue = existing_sync_issues.pop(eid, None)
@@ -83,7 +85,7 @@ def command_autosync(options):
                     issue.config = autosync
 
                 if new_issue:
-                    session.add(issue)
+                    new_issues.append(issue)
 
                     data = {'name': issue.package_name,
                             'src_os': autosync.source.os_name,
@@ -95,6 +97,8 @@ def command_autosync(options):
 
                     emitter.submit_event('new-autosync-issue', data)
 
+            session.add_all(new_issues)
+
             for eissue in existing_sync_issues.values():
                 session.delete(eissue)
 
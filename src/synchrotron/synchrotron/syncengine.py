@@ -100,13 +100,8 @@ class SyncEngine:
         component = ArchiveComponent(component_name)
         arch = ArchiveArchitecture(arch_name)
         arch_all = ArchiveArchitecture('all')
-        bpkgs = repo.binary_packages(suite, component, arch)
-        bpkgs.extend(repo.binary_packages(suite, component, arch_all))  # always append arch:all packages
-
-        if with_installer:
-            # add d-i packages to the mix
-            bpkgs.extend(repo.installer_packages(suite, component, arch))
-            bpkgs.extend(repo.installer_packages(suite, component, arch_all))  # always append arch:all packages
+        # always append arch:all packages, and add d-i packages to the mix if requested
+        bpkgs = repo.binary_packages_all(suite, [component], [arch, arch_all], with_installer=with_installer)
         return make_newest_packages_dict(bpkgs)
 
     def _get_target_source_packages(self, component: str):
@@ -225,7 +220,7 @@ class SyncEngine:
                         if not ignore_target_changes and self._distro_tag in version_revision(ebpkg.version):
                             # safety measure, we should never get here as packages with modifications were
                             # filtered out previously.
-                            log.debug('Can not sync binary package {}/{}: Target has modifications.'.format(bin_i.name, bin_i.version))
+                            log.debug('Can not sync binary package %s/%s: Target has modifications.', bin_i.name, bin_i.version)
                             continue
 
                     fname = self._source_repo.get_file(bpkg.bin_file)
@@ -239,7 +234,7 @@ class SyncEngine:
                         return False
 
             if not bin_files_synced and not existing_packages:
-                log.warning('No binary packages synced for source {}/{}'.format(spkg.name, spkg.version))
+                log.warning('No binary packages synced for source %s/%s', spkg.name, spkg.version)
 
         return True
 
@@ -273,10 +268,10 @@ class SyncEngine:
                 dpkg = dest_pkg_map.get(pkgname)
 
                 if not spkg:
-                    log.info('Can not sync {}: Does not exist in source.'.format(pkgname))
+                    log.info('Can not sync %s: Does not exist in source.', pkgname)
                     continue
                 if pkgname in self._sync_blacklist:
-                    log.info('Can not sync {}: The package is blacklisted.'.format(pkgname))
+                    log.info('Can not sync %s: The package is blacklisted.', pkgname)
                     continue
 
                 if dpkg:
@@ -18,6 +18,7 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 from flask import Blueprint, render_template
+from sqlalchemy.orm import undefer
 from laniakea.db import session_scope, SynchrotronIssue, SynchrotronIssueKind, SyncBlacklistEntry
 
 synchronization = Blueprint('synchronization',
@@ -28,7 +29,9 @@ synchronization = Blueprint('synchronization',
 @synchronization.route('/')
 def index():
     with session_scope() as session:
-        issues = session.query(SynchrotronIssue).all()
+        issues = session.query(SynchrotronIssue) \
+                        .options(undefer(SynchrotronIssue.details)) \
+                        .all()
 
         return render_template('synchronization/index.html', issues=issues, SyncIssueKind=SynchrotronIssueKind)
 
@@ -137,14 +137,16 @@ def bin_package_details(suite_name, name):
                        .options(joinedload(BinaryPackage.architecture)) \
                        .options(joinedload(BinaryPackage.bin_file)) \
                        .options(undefer(BinaryPackage.version)) \
+                       .join(BinaryPackage.suites) \
                        .filter(BinaryPackage.name == name) \
-                       .filter(BinaryPackage.suites.any(ArchiveSuite.id == suite.id)) \
+                       .filter(ArchiveSuite.id == suite.id) \
                        .order_by(BinaryPackage.version.desc()).all()
         if not bpkgs:
             abort(404)
 
         suites = [s[0] for s in session.query(ArchiveSuite.name.distinct())
-                                       .filter(ArchiveSuite.bin_packages.any(BinaryPackage.name == name))
+                                       .join(ArchiveSuite.bin_packages)
+                                       .filter(BinaryPackage.name == name)
                                        .all()]
 
         architectures = set()
@@ -185,7 +187,8 @@ def src_package_details(suite_name, name):
 
         spkgs = session.query(SourcePackage) \
                        .options(undefer(SourcePackage.version)) \
-                       .filter(SourcePackage.suites.any(ArchiveSuite.id == suite.id)) \
+                       .join(SourcePackage.suites) \
+                       .filter(ArchiveSuite.id == suite.id) \
                        .filter(SourcePackage.name == name) \
                        .order_by(SourcePackage.version.desc()) \
                        .all()
@@ -193,7 +196,8 @@ def src_package_details(suite_name, name):
             abort(404)
 
         suites = [s[0] for s in session.query(ArchiveSuite.name.distinct())
-                                       .filter(ArchiveSuite.src_packages.any(SourcePackage.name == name))
+                                       .join(ArchiveSuite.src_packages)
+                                       .filter(SourcePackage.name == name)
                                        .all()]
         spkg_rep = spkgs[0]  # the first package is always the most recent one
 
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2020 Matthias Klumpp <matthias@tenstral.net>
+#
+# Licensed under the GNU Lesser General Public License Version 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the license, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import pytest
+
+
+@pytest.fixture(scope='module')
+def mirk_filters(sourcesdir):
+    sys.path.insert(0, os.path.join(sourcesdir, 'mirk'))
+    from mirk import filters
+    return filters
+
+
+def _rules_match(filters, rules, event):
+    compiled_rules = filters.compile_filter_rules(rules)
+    return filters.filter_rules_match_event(compiled_rules, filters.event_filter_data(event))
+
+
+def test_filter_scalar_fields(mirk_filters):
+    rules = [{'tag': '_lk.jobs.*', 'job_architecture': ['amd64', 'arm*']}]
+
+    event = {'tag': '_lk.jobs.job-assigned', 'data': {'job_architecture': 'arm64'}}
+    assert _rules_match(mirk_filters, rules, event)
+    # the event itself must not be modified
+    assert 'tag' not in event['data']
+
+    event = {'tag': '_lk.jobs.job-assigned', 'data': {'job_architecture': 'i386'}}
+    assert not _rules_match(mirk_filters, rules, event)
+    event = {'tag': '_lk.synchrotron.src-package-imported', 'data': {'job_architecture': 'amd64'}}
+    assert not _rules_match(mirk_filters, rules, event)
+
+    # values missing from the event are ignored
+    event = {'tag': '_lk.jobs.job-finished', 'data': {}}
+    assert _rules_match(mirk_filters, rules, event)
+
+    # any matching rule is enough, and an empty pattern list never matches
+    rules = [{'tag': []}, {'tag': '_lk.archive.*'}]
+    assert _rules_match(mirk_filters, rules, {'tag': '_lk.archive.package-published', 'data': {}})
+    assert not _rules_match(mirk_filters, rules[:1], {'tag': '_lk.archive.package-published', 'data': {}})
+
+
+def test_filter_list_fields(mirk_filters):
+    rules = [{'architectures': ['amd64', 'i*']}]
+
+    assert _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'architectures': ['amd64', 'i386']}})
+    # every list element has to match one of the patterns
+    assert not _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'architectures': ['amd64', 'arm64']}})
+    # an empty list is ignored, like a missing value
+    assert not _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'architectures': []}})
+
+
+def test_filter_non_string_fields(mirk_filters):
+    # non-string values never decide whether a rule matches
+    rules = [{'tag': 'x', 'version_count': '1*'}]
+    assert _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'version_count': 2}})
+    assert _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'version_count': {'a': 1}}})
+
+    rules = [{'version': '1.*', 'count': 'foo*'}]
+    assert _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'version': '1.2', 'count': 3}})
+    # if only non-string values are present, nothing was matched at all
+    assert not _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'count': 3}})
+
+    # non-string list elements are skipped, only the strings have to match
+    rules = [{'ids': ['1', '2?']}]
+    assert _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'ids': [5, 33, '1']}})
+    assert not _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'ids': [1, '3']}})
+    assert not _rules_match(mirk_filters, rules, {'tag': 'x', 'data': {'ids': [1, 23]}})
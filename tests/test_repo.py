@@ -114,6 +114,41 @@ def validate_bin_packages(bpkgs):
         assert pkg.bin_file.sha256sum == 'c0915bf4c3d6d42525c93827d9fd107447d68942e4a187fcbf4c68e78a12a6cf'
     assert found
 
+    for pkg in bpkgs:
+        if pkg.name == 'kernel-wedge':
+            assert pkg.source_name == 'kernel-wedge'
+            assert pkg.source_version == '2.94'
+        elif pkg.name == '0ad-dbg':
+            assert pkg.source_name == '0ad'
+            assert pkg.source_version == '0.0.20-1'
+
+
+def test_source_field_regex():
+    from laniakea.repository import _SOURCE_FIELD_RE
+
+    m = _SOURCE_FIELD_RE.match('0ad')
+    assert m.group(1) == '0ad'
+    assert m.group(2) is None
+
+    m = _SOURCE_FIELD_RE.match('linux-signed-amd64 (4.19.37-5+deb10u1)')
+    assert m.group(1) == 'linux-signed-amd64'
+    assert m.group(2) == '4.19.37-5+deb10u1'
+
+    m = _SOURCE_FIELD_RE.match('glibc ( 1:2.28-10 )')
+    assert m.group(1) == 'glibc'
+    assert m.group(2) == '1:2.28-10'
+
+
+def test_uploaders_regex():
+    from laniakea.repository import _UPLOADERS_RE
+
+    assert _UPLOADERS_RE.findall('') == []
+    uploaders = [u.strip() for u in _UPLOADERS_RE.findall('Vincent Cheng <vcheng@debian.org>')]
+    assert uploaders == ['Vincent Cheng <vcheng@debian.org>']
+
+    uploaders = [u.strip() for u in _UPLOADERS_RE.findall(' Jane Doe <jane@example.org>,\n "Doe, John" <john@example.org>, ')]
+    assert uploaders == ['Jane Doe <jane@example.org>', '"Doe, John" <john@example.org>']
+
 
 def test_repo_local(samplesdir, localconfig):
     keyrings = localconfig.trusted_gpg_keyrings
@@ -131,8 +166,8 @@ def test_repo_local(samplesdir, localconfig):
 
     # try again!
     repo = Repository(repo_location, 'Dummy', trusted_keyrings=keyrings)
-    src_pkgs = repo.source_packages(suite, component)
-    bin_pkgs = repo.binary_packages(suite, component, arch)
+    src_pkgs = list(repo.source_packages(suite, component))
+    bin_pkgs = list(repo.binary_packages(suite, component, arch))
     assert len(bin_pkgs) == 4
     bin_pkgs.extend(repo.binary_packages(suite, component, arch_all))
 